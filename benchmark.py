@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+from datetime import datetime
+from time import perf_counter
+
+# Benchmarks run without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import qVersion
+from PySide6.QtWidgets import QApplication
+
+from src.engine import build_trace, replay
+from src.main_window import MainWindow
+
+
+def timed(function, repeat: int = 1) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return statistics.median(times)
+
+
+def playback(app: QApplication, window: MainWindow, chunk: int, limit: int) -> dict:
+    quicksort_widget = window.quicksort_widget
+    quicksort_widget.start_stop()
+
+    start = perf_counter()
+    steps = 0
+    while not quicksort_widget.sorted and steps < limit:
+        steps += quicksort_widget.advance(min(chunk, limit - steps))
+        app.processEvents()
+    elapsed = perf_counter() - start
+    complete = quicksort_widget.sorted
+    # The trace is generated during playback, so its length is only known
+    # once generation has finished
+    trace = quicksort_widget.trace
+    total = len(trace) if trace.complete else None
+
+    quicksort_widget.start_stop()
+    return {
+        "steps": steps,
+        "total_steps": total,
+        "complete": complete,
+        # Playback stopped at --playback-limit before the array was sorted
+        "limit_reached": not complete and steps >= limit,
+        "seconds": elapsed,
+        "steps_per_second": steps / elapsed if elapsed else None,
+    }
+
+
+def bench_size(app: QApplication, window: MainWindow, n: int, args) -> dict:
+    quicksort_widget = window.quicksort_widget
+
+    def resize():
+        quicksort_widget.number_of_elements = n
+        quicksort_widget.create_elements()
+        app.processEvents()
+
+    result = {"n": n, "resize_seconds": timed(resize)}
+    result["shuffle_seconds"] = timed(quicksort_widget.shuffle, args.repeat)
+    app.processEvents()
+
+    values = list(quicksort_widget.canvas.values)
+    trace = None
+
+    def generate():
+        nonlocal trace
+        trace = build_trace(values, args.pivot, partition=args.partition)
+
+    result["trace_generation_seconds"] = timed(generate)
+    result["trace_steps"] = len(trace)
+    result["replay_seconds"] = timed(lambda: replay(values, trace))
+    # A canvas without height would skip painting and time nothing
+    assert quicksort_widget.canvas.height() > 0, "the bar canvas has no height"
+    result["repaint_seconds"] = timed(quicksort_widget.canvas.repaint, args.repeat)
+    result["playback"] = playback(app, window, args.chunk, args.playback_limit)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark trace generation, playback and rendering.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[60, 1000, 10000, 100000])
+    parser.add_argument("--input", default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pivot", default="first")
+    parser.add_argument("--partition", default="green_red")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of the cheap measurements")
+    parser.add_argument("--chunk", type=int, default=1024, help="Steps applied per frame during playback")
+    parser.add_argument(
+        "--playback-limit", type=int, default=1000000, help="Maximum number of steps played back per size"
+    )
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    args = parser.parse_args(argv)
+
+    app = QApplication([])
+    window = MainWindow()
+    window.input_combobox.setCurrentText(args.input)
+    window.input_seed_spinbox.setValue(args.seed)
+    window.pivot_combobox.setCurrentText(args.pivot)
+    window.partition_combobox.setCurrentText(args.partition)
+    # Fixed size, so repaint times are comparable between runs
+    window.resize(1280, 900)
+    window.show()
+    app.processEvents()
+
+    results = []
+    for n in args.sizes:
+        result = bench_size(app, window, n, args)
+        results.append(result)
+        print(
+            f"N={n}: {result['trace_steps']} steps, "
+            f"generation {result['trace_generation_seconds']:.3f} s, "
+            f"playback {result['playback']['steps_per_second'] or 0:,.0f} steps/s"
+            f"{' (limit reached)' if result['playback']['limit_reached'] else ''}, "
+            f"repaint {result['repaint_seconds'] * 1000:.2f} ms"
+        )
+
+    report = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "qt": qVersion(),
+        "platform": platform.platform(),
+        "input": args.input,
+        "seed": args.seed,
+        "pivot": args.pivot,
+        "partition": args.partition,
+        "playback_limit": args.playback_limit,
+        "canvas_size": [window.quicksort_widget.canvas.width(), window.quicksort_widget.canvas.height()],
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    window.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import argparse
+import sys
+from collections import Counter
+from time import perf_counter
+
+from .engine import ALGORITHMS, PARTITION_SCHEMES, PIVOT_STRATEGIES, build_trace, replay, sort_steps
+from .inputs import INPUT_DISTRIBUTIONS, generate_input
+from .trace import Op
+from .trace_file import open_trace, save_trace
+
+
+def positive_int(text: str) -> int:
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return value
+
+
+def frame_size(text: str) -> tuple:
+    try:
+        width, height = (int(size) for size in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width < 1 or height < 1:
+        raise argparse.ArgumentTypeError(f"the frame size must be positive, got {text!r}")
+    return width, height
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description="Sort an array without the GUI and report the generated steps.",
+    )
+    parser.add_argument("values", nargs="*", type=int, help="Values to sort. An array is generated when omitted")
+    parser.add_argument("-n", "--size", type=int, default=1000, help="Size of the generated array")
+    parser.add_argument(
+        "--input", choices=INPUT_DISTRIBUTIONS, default="random", help="Distribution of the generated array"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the generated array")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="quicksort", help="Sorting algorithm")
+    parser.add_argument("--pivot", choices=PIVOT_STRATEGIES, default="first", help="Pivot selection strategy")
+    parser.add_argument("--pivot-seed", type=int, default=0, help="Seed for the random pivot strategy")
+    parser.add_argument(
+        "--partition", choices=PARTITION_SCHEMES, default="green_red", help="Partition scheme"
+    )
+    parser.add_argument(
+        "--cutoff", type=int, default=16, help="Largest range introsort leaves to insertion sort"
+    )
+    parser.add_argument("--stream", action="store_true", help="Count steps from the generator without storing a trace")
+    parser.add_argument("--save", metavar="PATH", help="Save the trace to a file")
+    parser.add_argument("--replay", metavar="PATH", help="Open a saved trace instead of generating one")
+    parser.add_argument(
+        "--export", metavar="PATH", help="Render the trace to a .gif, an animated .png or a directory of frames"
+    )
+    parser.add_argument("--every", type=positive_int, default=1, help="Export one frame every EVERY steps")
+    parser.add_argument("--frame-size", type=frame_size, default=(640, 360), help="Size of the exported frames, WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=positive_int, default=30, help="Frame rate of the exported animation")
+    parser.add_argument("--jobs", type=positive_int, default=None, help="Processes rendering the frames, one per CPU by default")
+    parser.add_argument("--no-validate", action="store_true", help="Skip replaying the trace to check the result")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.stream and (args.save or args.replay or args.export):
+        print("Error: --stream does not store a trace to save, replay or export", file=sys.stderr)
+        return 2
+
+    start = perf_counter()
+    if args.replay:
+        try:
+            values, settings, trace = open_trace(args.replay)
+        except (OSError, ValueError) as error:
+            print(f"Error: {error}", file=sys.stderr)
+            return 1
+        print(f"Elements: {len(values)}, " + ", ".join(f"{key}: {value}" for key, value in settings.items()))
+        counts = Counter(trace.ops)
+        steps = len(trace)
+        elapsed = perf_counter() - start
+        print(f"Loaded {args.replay} in {elapsed:.3f} s")
+    else:
+        values = args.values or generate_input(args.input, args.size, args.seed)
+        input_name = "given" if args.values else args.input
+        print(
+            f"Elements: {len(values)}, input: {input_name}, algorithm: {args.algorithm}, "
+            f"pivot: {args.pivot}, partition: {args.partition}"
+        )
+
+        if args.stream:
+            v = list(values)
+            steps = sort_steps(v, args.algorithm, args.pivot, args.pivot_seed, args.partition, args.cutoff)
+            counts = Counter(step[0] for step in steps)
+            steps = sum(counts.values())
+        else:
+            trace = build_trace(
+                values, args.pivot, args.pivot_seed, args.partition, args.algorithm, args.cutoff
+            )
+            counts = Counter(trace.ops)
+            steps = len(trace)
+        elapsed = perf_counter() - start
+        print(f"Generation time: {elapsed:.3f} s ({steps / max(elapsed, 1e-9):,.0f} steps/s)")
+
+        settings = {
+            "algorithm": args.algorithm,
+            "pivot": args.pivot,
+            "seed": args.pivot_seed,
+            "partition": args.partition,
+            "cutoff": args.cutoff,
+        }
+        if args.save:
+            save_trace(args.save, values, trace, settings)
+            print(f"Saved to {args.save}")
+
+    print(f"Steps: {steps}")
+    for op in Op:
+        print(f"  {op.name.lower()}: {counts.get(op, 0)}")
+
+    if args.stream:
+        if v != sorted(values):
+            print("Error: the array is not sorted", file=sys.stderr)
+            return 1
+    elif not args.no_validate:
+        start = perf_counter()
+        state = replay(values, trace)
+        elapsed = perf_counter() - start
+        if list(state.values) != sorted(values):
+            print("Error: replaying the trace does not sort the array", file=sys.stderr)
+            return 1
+        print(f"Replay time: {elapsed:.3f} s, result is sorted")
+        print(f"Comparisons: {state.comparisons}, swaps: {state.swaps}, max depth: {state.max_depth}")
+        phases = state.phase_steps()
+        if len(phases) > 1:
+            print("Steps per phase:")
+            for phase, count in phases.items():
+                print(f"  {phase}: {count} ({count / len(trace):.1%})")
+
+    if args.export:
+        # Rendering needs PySide6, so it is only imported here
+        from .export import export_trace
+
+        width, height = args.frame_size
+        show_blue = settings.get("partition") == "three_way" or settings.get("algorithm") == "dual_pivot"
+        start = perf_counter()
+        try:
+            frames = export_trace(
+                values, trace, args.export, args.every, width, height, args.fps, args.jobs, show_blue
+            )
+        except ValueError as error:
+            print(f"Error: {error}", file=sys.stderr)
+            return 1
+        elapsed = perf_counter() - start
+        print(
+            f"Exported {frames} frames to {args.export} in {elapsed:.3f} s "
+            f"({frames / max(elapsed, 1e-9):,.1f} frames/s)"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
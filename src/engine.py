@@ -0,0 +1,437 @@
+# Sorting engines. They only depend on the standard library, so traces can be
+# generated and checked without PySide6 or a display.
+from array import array
+from random import Random
+
+from .timeline import SortState
+from .trace import Op, Trace
+
+
+def median_of_three(v: list, i: int, j: int, k: int) -> int:
+    if v[i] < v[j]:
+        if v[j] < v[k]:
+            return j
+        return k if v[i] < v[k] else i
+    if v[i] < v[k]:
+        return i
+    return k if v[j] < v[k] else j
+
+
+def pivot_first(v: list, start: int, end: int, rng: Random) -> int:
+    return start
+
+
+def pivot_random(v: list, start: int, end: int, rng: Random) -> int:
+    return rng.randint(start, end)
+
+
+def pivot_median3(v: list, start: int, end: int, rng: Random) -> int:
+    return median_of_three(v, start, (start + end) // 2, end)
+
+
+def pivot_ninther(v: list, start: int, end: int, rng: Random) -> int:
+    # Tukey's ninther: median of the medians of three groups of three.
+    # Small ranges fall back to a plain median of three.
+    size = end - start + 1
+    if size < 40:
+        return pivot_median3(v, start, end, rng)
+    step = size // 8
+    middle = (start + end) // 2
+    return median_of_three(
+        v,
+        median_of_three(v, start, start + step, start + 2 * step),
+        median_of_three(v, middle - step, middle, middle + step),
+        median_of_three(v, end - 2 * step, end - step, end),
+    )
+
+
+PIVOT_STRATEGIES = {
+    "first": pivot_first,
+    "random": pivot_random,
+    "median3": pivot_median3,
+    "ninther": pivot_ninther,
+}
+
+
+def compare(value: int, pivot_value: int) -> int:
+    return (value > pivot_value) - (value < pivot_value)
+
+
+# Partition schemes. Each one expects the pivot at v[start], yields the steps
+# that animate it and returns the two ranges left to sort.
+
+def partition_green_red(v: list, start: int, end: int):
+    # Green scans the range backwards and every element greater than the
+    # pivot is swapped behind red, so the pivot lands on red at the end.
+    pivot_index = start
+    pivot_value = v[start]
+    green = end
+    red = end
+
+    yield Op.PICK_GREEN_RED, green, v[green], red, v[red]
+
+    while green > start:
+        if pivot_value < v[green]:
+            yield Op.GREEN_GREATER_PIVOT, green, v[green], pivot_index, pivot_value
+
+            yield Op.SWAP_GREEN_RED, green, v[green], red, v[red]
+            v[green], v[red] = v[red], v[green]
+
+            red -= 1
+            yield Op.DECREASE_RED, 0, 0, 0, 0
+        else:
+            yield Op.GREEN_LESS_EQ_PIVOT, green, v[green], pivot_index, pivot_value
+
+        green -= 1
+        yield Op.DECREASE_GREEN, 0, 0, 0, 0
+
+    yield Op.SWAP_PIVOT_RED, pivot_index, pivot_value, red, v[red]
+    v[start], v[red] = v[red], v[start]
+    return (start, red - 1), (red + 1, end)
+
+
+def partition_lomuto(v: list, start: int, end: int):
+    # Green scans forward, red is the last element smaller than the pivot
+    pivot_value = v[start]
+    red = start
+    yield Op.MOVE_RED, red, v[red], 0, 0
+
+    for green in range(start + 1, end + 1):
+        yield Op.MOVE_GREEN, green, v[green], 0, 0
+        yield Op.COMPARE, green, v[green], pivot_value, compare(v[green], pivot_value)
+        if v[green] < pivot_value:
+            red += 1
+            yield Op.MOVE_RED, red, v[red], 0, 0
+            if red != green:
+                yield Op.SWAP, red, v[red], green, v[green]
+                v[red], v[green] = v[green], v[red]
+
+    if red != start:
+        yield Op.SWAP, start, v[start], red, v[red]
+        v[start], v[red] = v[red], v[start]
+    return (start, red - 1), (red + 1, end)
+
+
+def partition_hoare(v: list, start: int, end: int):
+    # Green moves forward and red backwards until both find an element on
+    # the wrong side, then they are swapped. The pivot is not placed in its
+    # final position, so it stays inside one of the returned ranges.
+    pivot_value = v[start]
+    green = start - 1
+    red = end + 1
+    while True:
+        while True:
+            green += 1
+            yield Op.MOVE_GREEN, green, v[green], 0, 0
+            yield Op.COMPARE, green, v[green], pivot_value, compare(v[green], pivot_value)
+            if v[green] >= pivot_value:
+                break
+        while True:
+            red -= 1
+            yield Op.MOVE_RED, red, v[red], 0, 0
+            yield Op.COMPARE, red, v[red], pivot_value, compare(v[red], pivot_value)
+            if v[red] <= pivot_value:
+                break
+        if green >= red:
+            return (start, red), (red + 1, end)
+
+        yield Op.SWAP, green, v[green], red, v[red]
+        v[green], v[red] = v[red], v[green]
+
+
+def partition_three_way(v: list, start: int, end: int):
+    # Dijkstra's Dutch national flag: red and blue delimit the elements equal
+    # to the pivot while green scans between them. Runs of duplicates are
+    # excluded from both returned ranges.
+    pivot_value = v[start]
+    red = start
+    green = start + 1
+    blue = end
+    yield Op.MOVE_RED, red, v[red], 0, 0
+    yield Op.MOVE_BLUE, blue, v[blue], 0, 0
+
+    while green <= blue:
+        yield Op.MOVE_GREEN, green, v[green], 0, 0
+        result = compare(v[green], pivot_value)
+        yield Op.COMPARE, green, v[green], pivot_value, result
+        if result < 0:
+            yield Op.SWAP, red, v[red], green, v[green]
+            v[red], v[green] = v[green], v[red]
+            red += 1
+            yield Op.MOVE_RED, red, v[red], 0, 0
+            green += 1
+        elif result > 0:
+            yield Op.SWAP, green, v[green], blue, v[blue]
+            v[green], v[blue] = v[blue], v[green]
+            blue -= 1
+            yield Op.MOVE_BLUE, blue, v[blue], 0, 0
+        else:
+            green += 1
+
+    return (start, red - 1), (blue + 1, end)
+
+
+PARTITION_SCHEMES = {
+    "green_red": partition_green_red,
+    "hoare": partition_hoare,
+    "lomuto": partition_lomuto,
+    "three_way": partition_three_way,
+}
+
+
+def quicksort(
+    v: list,
+    start: int,
+    end: int,
+    pivot: str = "first",
+    seed: int = 0,
+    partition: str = "green_red",
+    stack: list | None = None,
+):
+    # Explicit stack instead of recursion. The larger side is pushed first
+    # so the smaller one is partitioned next, which keeps the stack depth
+    # in O(log N) even for sorted or reversed input. A `stack` list can be
+    # passed in to watch its size from outside.
+    choose_pivot = PIVOT_STRATEGIES[pivot]
+    partition_range = PARTITION_SCHEMES[partition]
+    rng = Random(seed)
+    stack = [] if stack is None else stack
+    stack.append((start, end))
+    while stack:
+        start, end = stack.pop()
+        if start >= end:
+            continue
+
+        pivot_index = choose_pivot(v, start, end, rng)
+        pivot_value = v[pivot_index]
+
+        yield Op.PIVOT, pivot_index, pivot_value, start, end
+
+        if pivot_index != start:
+            # The partition schemes expect the pivot at the start of the range
+            yield Op.SWAP_PIVOT_START, pivot_index, pivot_value, start, v[start]
+            v[start], v[pivot_index] = v[pivot_index], v[start]
+
+        left, right = yield from partition_range(v, start, end)
+
+        if left[1] - left[0] < right[1] - right[0]:
+            stack.append(right)
+            stack.append(left)
+        else:
+            stack.append(left)
+            stack.append(right)
+
+
+def sift_down(v: list, offset: int, root: int, size: int):
+    # Restores the max heap stored in v[offset:offset + size] below `root`
+    while (child := 2 * root + 1) < size:
+        yield Op.MOVE_GREEN, offset + root, v[offset + root], 0, 0
+        left = offset + child
+        if child + 1 < size:
+            result = compare(v[left + 1], v[left])
+            yield Op.COMPARE, left + 1, v[left + 1], v[left], result
+            if result > 0:
+                child += 1
+        i, j = offset + root, offset + child
+        yield Op.MOVE_RED, j, v[j], 0, 0
+        result = compare(v[j], v[i])
+        yield Op.COMPARE, j, v[j], v[i], result
+        if result <= 0:
+            return
+        yield Op.SWAP, i, v[i], j, v[j]
+        v[i], v[j] = v[j], v[i]
+        root = child
+
+
+def heapsort(v: list, start: int, end: int):
+    size = end - start + 1
+    for root in range(size // 2 - 1, -1, -1):
+        yield from sift_down(v, start, root, size)
+    for last in range(size - 1, 0, -1):
+        # The largest element leaves the heap
+        yield Op.SWAP, start, v[start], start + last, v[start + last]
+        v[start], v[start + last] = v[start + last], v[start]
+        yield from sift_down(v, start, 0, last)
+
+
+def insertion_sort(v: list, start: int, end: int):
+    for i in range(start + 1, end + 1):
+        value = v[i]
+        yield Op.MOVE_GREEN, i, value, 0, 0
+        j = i
+        while j > start:
+            result = compare(v[j - 1], value)
+            yield Op.COMPARE, j - 1, v[j - 1], value, result
+            if result <= 0:
+                break
+            j -= 1
+        if j != i:
+            yield Op.INSERT, i, value, j, v[j]
+            v[j + 1:i + 1] = v[j:i]
+            v[j] = value
+
+
+def introsort(
+    v: list,
+    start: int,
+    end: int,
+    pivot: str = "median3",
+    seed: int = 0,
+    partition: str = "hoare",
+    cutoff: int = 16,
+):
+    # Hybrid sort as used by production libraries: quicksort that leaves
+    # ranges of up to `cutoff` elements to insertion sort and switches to
+    # heapsort for ranges nested deeper than 2 * log2(N), so adversarial
+    # inputs stay in O(N log N)
+    choose_pivot = PIVOT_STRATEGIES[pivot]
+    partition_range = PARTITION_SCHEMES[partition]
+    rng = Random(seed)
+    stack = [(start, end, 2 * max(end - start + 1, 1).bit_length())]
+    while stack:
+        start, end, depth_limit = stack.pop()
+        if start >= end:
+            continue
+
+        if end - start + 1 <= cutoff:
+            yield Op.INSERTION_RANGE, start, end, 0, 0
+            yield from insertion_sort(v, start, end)
+            continue
+
+        if depth_limit == 0:
+            yield Op.HEAPSORT_RANGE, start, end, 0, 0
+            yield from heapsort(v, start, end)
+            continue
+
+        pivot_index = choose_pivot(v, start, end, rng)
+        yield Op.PIVOT, pivot_index, v[pivot_index], start, end
+
+        if pivot_index != start:
+            yield Op.SWAP_PIVOT_START, pivot_index, v[pivot_index], start, v[start]
+            v[start], v[pivot_index] = v[pivot_index], v[start]
+
+        left, right = yield from partition_range(v, start, end)
+
+        first, second = (right, left) if left[1] - left[0] < right[1] - right[0] else (left, right)
+        stack.append((*first, depth_limit - 1))
+        stack.append((*second, depth_limit - 1))
+
+
+def dual_pivot_quicksort(v: list, start: int, end: int):
+    # Yaroslavskiy's scheme: the first and last elements are the pivots and
+    # the range is split in three. Red and blue delimit the middle part
+    # while green scans it.
+    stack = [(start, end)]
+    while stack:
+        start, end = stack.pop()
+        if start >= end:
+            continue
+
+        # The range is announced before the pivots are put in order, so
+        # every step of a partition comes after its PIVOT
+        yield Op.PIVOT, start, v[start], start, end
+        result = compare(v[start], v[end])
+        yield Op.COMPARE, start, v[start], v[end], result
+        if result > 0:
+            yield Op.SWAP, start, v[start], end, v[end]
+            v[start], v[end] = v[end], v[start]
+        low, high = v[start], v[end]
+
+        red = start + 1
+        blue = end - 1
+        green = red
+        yield Op.MOVE_RED, red, v[red], 0, 0
+        yield Op.MOVE_BLUE, blue, v[blue], 0, 0
+        while green <= blue:
+            yield Op.MOVE_GREEN, green, v[green], 0, 0
+            result = compare(v[green], low)
+            yield Op.COMPARE, green, v[green], low, result
+            if result < 0:
+                if green != red:
+                    yield Op.SWAP, green, v[green], red, v[red]
+                    v[green], v[red] = v[red], v[green]
+                red += 1
+                yield Op.MOVE_RED, red, v[red], 0, 0
+            else:
+                result = compare(v[green], high)
+                yield Op.COMPARE, green, v[green], high, result
+                if result > 0:
+                    while True:
+                        result = compare(v[blue], high)
+                        yield Op.COMPARE, blue, v[blue], high, result
+                        if result <= 0 or green >= blue:
+                            break
+                        blue -= 1
+                        yield Op.MOVE_BLUE, blue, v[blue], 0, 0
+                    yield Op.SWAP, green, v[green], blue, v[blue]
+                    v[green], v[blue] = v[blue], v[green]
+                    blue -= 1
+                    yield Op.MOVE_BLUE, blue, v[blue], 0, 0
+                    result = compare(v[green], low)
+                    yield Op.COMPARE, green, v[green], low, result
+                    if result < 0:
+                        yield Op.SWAP, green, v[green], red, v[red]
+                        v[green], v[red] = v[red], v[green]
+                        red += 1
+                        yield Op.MOVE_RED, red, v[red], 0, 0
+            green += 1
+
+        # Both pivots move to their final positions
+        red -= 1
+        blue += 1
+        if red != start:
+            yield Op.SWAP, start, v[start], red, v[red]
+            v[start], v[red] = v[red], v[start]
+        if blue != end:
+            yield Op.SWAP, end, v[end], blue, v[blue]
+            v[end], v[blue] = v[blue], v[end]
+
+        ranges = sorted(((start, red - 1), (red + 1, blue - 1), (blue + 1, end)), key=lambda r: r[0] - r[1])
+        stack.extend(ranges)
+
+
+ALGORITHMS = {
+    "quicksort": quicksort,
+    "introsort": introsort,
+    "dual_pivot": dual_pivot_quicksort,
+    "heapsort": heapsort,
+}
+
+# Algorithms that take pivot and partition settings
+CONFIGURABLE = {"quicksort", "introsort"}
+
+
+def sort_steps(
+    v: list,
+    algorithm: str = "quicksort",
+    pivot: str = "first",
+    seed: int = 0,
+    partition: str = "green_red",
+    cutoff: int = 16,
+):
+    if algorithm == "introsort":
+        return introsort(v, 0, len(v) - 1, pivot, seed, partition, cutoff)
+    if algorithm in CONFIGURABLE:
+        return ALGORITHMS[algorithm](v, 0, len(v) - 1, pivot, seed, partition)
+    return ALGORITHMS[algorithm](v, 0, len(v) - 1)
+
+
+def build_trace(
+    values,
+    pivot: str = "first",
+    seed: int = 0,
+    partition: str = "green_red",
+    algorithm: str = "quicksort",
+    cutoff: int = 16,
+) -> Trace:
+    v = list(values)
+    trace = Trace()
+    trace.extend(sort_steps(v, algorithm, pivot, seed, partition, cutoff))
+    return trace
+
+
+def replay(values, trace: Trace) -> SortState:
+    state = SortState(array("i", values))
+    for i in range(len(trace)):
+        state.apply(*trace.read(i))
+    return state
@@ -0,0 +1,403 @@
+# Offline export of a trace as an animated GIF, an animated PNG or a
+# directory of PNG frames. The trace is replayed in this process and every
+# `every`-th state is sent, in batches, to a pool of worker processes that
+# render the frames offscreen and encode them. Frames only store what changed
+# since the previous one, so most of them are a few columns wide.
+import os
+import struct
+import zlib
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from .inputs import check_values
+from .timeline import SortState
+from .widgets import spectral_color
+
+BATCH_SIZE = 16
+
+BACKGROUND, MARKER_BACKGROUND, PIVOT, GREEN, RED, BLUE, RANGE = range(7)
+FIRST_BAR_COLOR = 7
+BAR_COLORS = 256 - FIRST_BAR_COLOR
+PALETTE = [
+    (240, 240, 240),
+    (230, 230, 230),
+    (255, 255, 0),
+    (0, 255, 0),
+    (255, 77, 77),
+    (80, 80, 255),
+    (0, 0, 0),
+] + [
+    tuple(round(c) for c in spectral_color(400 + 250 * k / (BAR_COLORS - 1)))
+    for k in range(BAR_COLORS)
+]
+
+application = None
+
+
+def init_worker():
+    # QPainter needs a QGuiApplication, which is created once per worker
+    global application
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtGui import QGuiApplication
+
+    application = QGuiApplication.instance() or QGuiApplication([])
+
+
+def capture(state: SortState) -> tuple:
+    return (
+        state.values.tobytes(),
+        state.pivot,
+        state.green,
+        state.red,
+        state.blue,
+        state.start,
+        state.end,
+    )
+
+
+def render(frame: tuple, width: int, height: int, show_blue: bool) -> bytes:
+    # Returns the frame as one palette index per pixel, row by row
+    from PySide6.QtGui import QColor, QImage, QPainter
+
+    values_bytes, pivot, green, red, blue, start, end = frame
+    values = array("i")
+    values.frombytes(values_bytes)
+    n = len(values)
+    colors = [QColor(*color) for color in PALETTE]
+
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(colors[BACKGROUND])
+    qp = QPainter(image)
+
+    def column(i: int) -> tuple:
+        left = width * i // n
+        return left, max(width * (i + 1) // n - left, 1)
+
+    rows = [PIVOT, RANGE, GREEN, RED] + ([BLUE] if show_blue else [])
+    row_height = max(height // 30, 2)
+    bars_height = height - row_height * len(rows)
+    row_top = {PIVOT: 0, RANGE: row_height + bars_height}
+    for k, row in enumerate(rows[2:]):
+        row_top[row] = row_top[RANGE] + row_height * (k + 1)
+
+    for row, position in ((PIVOT, pivot), (GREEN, green), (RED, red), (BLUE, blue)):
+        if row not in row_top:
+            continue
+        qp.fillRect(0, row_top[row], width, row_height - 1, colors[MARKER_BACKGROUND])
+        if position is not None and 0 <= position < n:
+            left, column_width = column(position)
+            qp.fillRect(left, row_top[row], column_width, row_height - 1, colors[row])
+
+    if 0 <= start <= end < n:
+        left = column(start)[0]
+        right = sum(column(end))
+        qp.fillRect(left, row_top[RANGE] + 1, right - left, row_height - 2, colors[RANGE])
+
+    bar_colors = [colors[FIRST_BAR_COLOR + (BAR_COLORS - 1) * value // n] for value in range(n + 1)]
+    top = row_height
+    for i, value in enumerate(values):
+        left, column_width = column(i)
+        if column_width > 3:
+            column_width -= 1
+        bar_height = bars_height * value // n
+        qp.fillRect(left, top + bars_height - bar_height, column_width, bar_height, bar_colors[value])
+    qp.end()
+
+    color_table = [QColor(*color).rgb() for color in PALETTE]
+    indexed = image.convertToFormat(QImage.Format_Indexed8, color_table)
+    bits = indexed.constBits().tobytes()
+    stride = indexed.bytesPerLine()
+    if stride == width:
+        return bits
+    return b"".join(bits[y * stride:y * stride + width] for y in range(height))
+
+
+def first_difference(a: bytes, b: bytes) -> int:
+    # Binary search on slices, so the loop runs in C
+    low, high = 0, len(a)
+    while low < high:
+        middle = (low + high) // 2
+        if a[low:middle + 1] == b[low:middle + 1]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def changed_rect(previous: bytes | None, pixels: bytes, width: int, height: int) -> tuple:
+    # Smallest (x, y, width, height) containing every changed pixel
+    if previous is None:
+        return 0, 0, width, height
+    rows = [
+        y for y in range(height)
+        if previous[y * width:(y + 1) * width] != pixels[y * width:(y + 1) * width]
+    ]
+    if not rows:
+        # GIF and APNG frames cannot be empty
+        return 0, 0, 1, 1
+    left, right = width, 0
+    for y in rows:
+        old, new = previous[y * width:(y + 1) * width], pixels[y * width:(y + 1) * width]
+        left = min(left, first_difference(old, new))
+        right = max(right, width - first_difference(old[::-1], new[::-1]))
+    return left, rows[0], right - left, rows[-1] - rows[0] + 1
+
+
+def crop(pixels: bytes, width: int, rect: tuple) -> bytes:
+    x, y, w, h = rect
+    if w == width:
+        return pixels[y * width:(y + h) * width]
+    return b"".join(pixels[row * width + x:row * width + x + w] for row in range(y, y + h))
+
+
+def lzw_encode(data: bytes, min_code_size: int = 8) -> bytes:
+    # Variable length LZW as used by GIF, codes packed least significant
+    # bit first
+    clear = 1 << min_code_size
+    end_of_information = clear + 1
+    out = bytearray()
+    buffer = 0
+    bits = 0
+    code_size = min_code_size + 1
+    next_code = end_of_information + 1
+    table = {}
+
+    def emit(code: int):
+        nonlocal buffer, bits
+        buffer |= code << bits
+        bits += code_size
+        while bits >= 8:
+            out.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+
+    emit(clear)
+    prefix = data[0]
+    for byte in data[1:]:
+        key = prefix << 8 | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+
+        emit(prefix)
+        if next_code < 4096:
+            if next_code >= 1 << code_size:
+                code_size += 1
+            table[key] = next_code
+            next_code += 1
+        else:
+            emit(clear)
+            table = {}
+            code_size = min_code_size + 1
+            next_code = end_of_information + 1
+        prefix = byte
+
+    emit(prefix)
+    if next_code >= 1 << code_size and code_size < 12:
+        code_size += 1
+    emit(end_of_information)
+    if bits:
+        out.append(buffer & 0xFF)
+    return bytes(out)
+
+
+def gif_frame(pixels: bytes, width: int, rect: tuple, delay: int) -> bytes:
+    x, y, w, h = rect
+    data = lzw_encode(crop(pixels, width, rect))
+    blocks = b"".join(bytes([len(data[i:i + 255])]) + data[i:i + 255] for i in range(0, len(data), 255))
+    return (
+        # Graphic control extension: keep the previous frame, delay in 1/100 s
+        struct.pack("<4BHBB", 0x21, 0xF9, 4, 0x04, delay, 0, 0)
+        + struct.pack("<BHHHHB", 0x2C, x, y, w, h, 0)
+        + bytes([8])
+        + blocks
+        + b"\0"
+    )
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_data(pixels: bytes, width: int, rect: tuple) -> bytes:
+    # Rows of palette indices without filtering
+    x, y, w, h = rect
+    data = crop(pixels, width, rect)
+    return zlib.compress(b"".join(b"\0" + data[row * w:(row + 1) * w] for row in range(h)), 6)
+
+
+def render_batch(batch: list, previous: tuple | None, options: dict) -> list:
+    # Renders a batch of frames in a worker. Returns what each output format
+    # needs: encoded GIF frames, compressed APNG frames or written file names.
+    width, height = options["width"], options["height"]
+    last = render(previous, width, height, options["show_blue"]) if previous else None
+    results = []
+    for index, frame in batch:
+        pixels = render(frame, width, height, options["show_blue"])
+        if options["format"] == "frames":
+            path = os.path.join(options["path"], f"frame_{index:06}.png")
+            write_png(path, pixels, width, height)
+            results.append(path)
+            continue
+
+        rect = changed_rect(last, pixels, width, height)
+        if options["format"] == "gif":
+            results.append(gif_frame(pixels, width, rect, options["gif_delay"]))
+        else:
+            results.append((rect, png_data(pixels, width, rect)))
+        last = pixels
+    return results
+
+
+def png_header(width: int, height: int) -> bytes:
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))
+        + png_chunk(b"PLTE", bytes(c for color in PALETTE for c in color))
+    )
+
+
+def write_png(path: str, pixels: bytes, width: int, height: int):
+    with open(path, "wb") as f:
+        f.write(png_header(width, height))
+        f.write(png_chunk(b"IDAT", png_data(pixels, width, (0, 0, width, height))))
+        f.write(png_chunk(b"IEND", b""))
+
+
+class Writer:
+    # Collects the rendered frames in order and writes the output file
+    def __init__(self, options: dict):
+        self.options = options
+        self.frames = 0
+        self.sequence = 0
+        self.file = None
+        width, height = options["width"], options["height"]
+
+        if options["format"] == "frames":
+            os.makedirs(options["path"], exist_ok=True)
+        elif options["format"] == "gif":
+            self.file = open(options["path"], "wb")
+            self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, 0, 0))
+            self.file.write(bytes(c for color in PALETTE for c in color))
+            # Loop forever
+            self.file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\0\0\0")
+        else:
+            self.file = open(options["path"], "wb")
+            self.file.write(png_header(width, height))
+            # The frame count is patched in close()
+            self.actl_offset = self.file.tell()
+            self.file.write(png_chunk(b"acTL", struct.pack(">II", 0, 0)))
+
+    def write(self, results: list):
+        for result in results:
+            if self.options["format"] == "gif":
+                self.file.write(result)
+            elif self.options["format"] == "apng":
+                self.write_apng_frame(*result)
+            self.frames += 1
+
+    def write_apng_frame(self, rect: tuple, data: bytes):
+        x, y, w, h = rect
+        numerator, denominator = self.options["apng_delay"]
+        self.file.write(
+            png_chunk(b"fcTL", struct.pack(">IIIIIHHBB", self.sequence, w, h, x, y, numerator, denominator, 0, 0))
+        )
+        self.sequence += 1
+        if self.frames == 0:
+            self.file.write(png_chunk(b"IDAT", data))
+        else:
+            self.file.write(png_chunk(b"fdAT", struct.pack(">I", self.sequence) + data))
+            self.sequence += 1
+
+    def close(self):
+        if self.options["format"] == "gif":
+            self.file.write(b"\x3B")
+        elif self.options["format"] == "apng":
+            self.file.write(png_chunk(b"IEND", b""))
+            self.file.seek(self.actl_offset)
+            self.file.write(png_chunk(b"acTL", struct.pack(">II", self.frames, 0)))
+        if self.file:
+            self.file.close()
+
+    def abort(self):
+        # Removes the partly written file of a failed export
+        if self.file:
+            self.file.close()
+            os.remove(self.options["path"])
+
+
+def output_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".gif":
+        return "gif"
+    if extension in (".png", ".apng"):
+        return "apng"
+    return "frames"
+
+
+def export_trace(
+    values,
+    trace,
+    path: str,
+    every: int = 1,
+    width: int = 640,
+    height: int = 360,
+    fps: int = 30,
+    jobs: int | None = None,
+    show_blue: bool = False,
+) -> int:
+    # Writes every `every`-th state of the trace, plus the final one, to
+    # `path`. Returns the number of frames.
+    check_values(values)
+    if min(every, width, height, fps) < 1:
+        raise ValueError("The frame interval, size and rate must be positive")
+    options = {
+        "path": path,
+        "format": output_format(path),
+        "width": width,
+        "height": height,
+        "show_blue": show_blue,
+        "gif_delay": max(round(100 / fps), 2),
+        "apng_delay": (1, fps),
+    }
+    state = SortState(array("i", values))
+    writer = Writer(options)
+    # Workers are spawned instead of forked, as forking a process that runs
+    # a Qt application is not safe
+    jobs = jobs or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(jobs, get_context("spawn"), initializer=init_worker) as executor:
+            pending = deque()
+            batch = []
+            previous = None
+            index = 0
+
+            def submit():
+                nonlocal batch, previous
+                pending.append(executor.submit(render_batch, batch, previous, options))
+                previous = batch[-1][1]
+                batch = []
+                # Bounded number of batches in flight keeps memory in check
+                while len(pending) > 2 * jobs:
+                    writer.write(pending.popleft().result())
+
+            batch.append((index, capture(state)))
+            for i in range(len(trace)):
+                state.apply(*trace.read(i))
+                if (i + 1) % every == 0 or i + 1 == len(trace):
+                    index += 1
+                    batch.append((index, capture(state)))
+                    if len(batch) == BATCH_SIZE:
+                        submit()
+            if batch:
+                submit()
+            while pending:
+                writer.write(pending.popleft().result())
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.frames
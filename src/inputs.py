@@ -0,0 +1,88 @@
+# Input distributions. Every generator returns an array of n values between 1
+# and n and is deterministic for a given seed. The structured distributions
+# are built from ranges, slices and repetition, so their loops run in C.
+# random and duplicates still draw every element in Python, through
+# Random.shuffle and Random.choices.
+from array import array
+from random import Random
+
+
+def input_random(n: int, rng: Random) -> array:
+    values = array("i", range(1, n + 1))
+    rng.shuffle(values)
+    return values
+
+
+def input_sorted(n: int, rng: Random) -> array:
+    return array("i", range(1, n + 1))
+
+
+def input_reversed(n: int, rng: Random) -> array:
+    return array("i", range(n, 0, -1))
+
+
+def input_nearly_sorted(n: int, rng: Random, swaps: int = 0) -> array:
+    # Sorted array with `swaps` random pairs exchanged, 1% of n by default
+    values = array("i", range(1, n + 1))
+    for _ in range(swaps or max(n // 100, 1)):
+        i, j = rng.randrange(n), rng.randrange(n)
+        values[i], values[j] = values[j], values[i]
+    return values
+
+
+def input_few_unique(n: int, rng: Random, unique: int = 8) -> array:
+    # `unique` distinct values spread evenly over 1..n. Random bytes are
+    # mapped to values with a translation table, so no per element Python
+    # code runs.
+    unique = min(max(unique, 1), n, 256)
+    levels = [n * (k + 1) // unique for k in range(unique)]
+    table = array("i", (levels[b % unique] for b in range(256)))
+    return array("i", map(table.__getitem__, rng.randbytes(n)))
+
+
+def input_organ_pipe(n: int, rng: Random) -> array:
+    # Rises to n in the middle and falls back
+    half = (n + 1) // 2
+    values = array("i", range(1, 2 * half, 2))
+    values.extend(range(2 * (n - half), 0, -2))
+    return values
+
+
+def input_sawtooth(n: int, rng: Random, teeth: int = 4) -> array:
+    teeth = min(max(teeth, 1), n)
+    width = -(-n // teeth)
+    # Every tooth climbs over the whole 1..n range
+    tooth = array("i", (n * (i + 1) // width for i in range(width)))
+    return (tooth * teeth)[:n]
+
+
+def input_duplicates(n: int, rng: Random) -> array:
+    # Uniform random values drawn with replacement, so about a third of them
+    # are repeated
+    return array("i", rng.choices(range(1, n + 1), k=n))
+
+
+INPUT_DISTRIBUTIONS = {
+    "random": input_random,
+    "sorted": input_sorted,
+    "reversed": input_reversed,
+    "nearly_sorted": input_nearly_sorted,
+    "few_unique": input_few_unique,
+    "organ_pipe": input_organ_pipe,
+    "sawtooth": input_sawtooth,
+    "duplicates": input_duplicates,
+}
+
+
+def generate_input(distribution: str, n: int, seed: int = 0) -> array:
+    return INPUT_DISTRIBUTIONS[distribution](n, Random(seed))
+
+
+def check_values(values):
+    # Bars are colored and labelled through tables indexed by value, so only
+    # values between 1 and n can be drawn
+    if values and not 1 <= min(values) <= max(values) <= len(values):
+        raise ValueError(
+            f"Values must be between 1 and {len(values)} to be drawn, "
+            f"found values from {min(values)} to {max(values)}"
+        )
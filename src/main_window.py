@@ -7,11 +7,14 @@ from PySide6.QtWidgets import (
     QLabel,
     QPushButton,
     QSpinBox,
-    QSplitter, QCheckBox,
+    QSplitter, QCheckBox, QFileDialog, QSlider, QComboBox, QMessageBox, QScrollArea,
 )
 
+from .engine import ALGORITHMS, CONFIGURABLE, PARTITION_SCHEMES, PIVOT_STRATEGIES
+from .inputs import INPUT_DISTRIBUTIONS
 from .quicksort_widget import QuicksortWidget
-from .widgets import ScrollAreaBottom, LogWidget
+from .race_window import RaceWindow
+from .widgets import LogWidget, MetricsWidget
 
 
 class MainWindow(QMainWindow):
@@ -28,21 +31,64 @@ class MainWindow(QMainWindow):
         self.central_layout.addLayout(self.array_size_layout)
         self.central_layout.setAlignment(Qt.AlignTop)
 
-        self.array_size_label = QLabel("Number of elements: ")
-        self.array_size_layout.addWidget(self.array_size_label)
+        self.array_size_layout.addWidget(QLabel("Input:"))
+        self.input_combobox = QComboBox()
+        self.input_combobox.addItems(list(INPUT_DISTRIBUTIONS))
+        self.input_combobox.setToolTip("Distribution of the values created by Shuffle!")
+        self.array_size_layout.addWidget(self.input_combobox)
+
+        self.array_size_layout.addWidget(QLabel("Seed:"))
+        self.input_seed_spinbox = QSpinBox()
+        self.input_seed_spinbox.setRange(0, 2**31 - 1)
+        self.input_seed_spinbox.setToolTip("The same seed always creates the same input")
+        self.array_size_layout.addWidget(self.input_seed_spinbox)
 
         self.array_size_layout.addStretch()
 
+        self.array_size_label = QLabel("Number of elements: ")
+        self.array_size_layout.addWidget(self.array_size_label)
+
         self.array_size_spinbox = QSpinBox()
-        self.array_size_spinbox.setRange(2, 60)
+        self.array_size_spinbox.setRange(2, 1000000)
         self.array_size_spinbox.setValue(6)
-        self.array_size_spinbox.setMinimumWidth(40)
+        self.array_size_spinbox.setMinimumWidth(60)
         self.array_size_layout.addWidget(self.array_size_spinbox)
 
         self.update_size_button = QPushButton("Update")
         self.array_size_layout.addWidget(self.update_size_button)
         self.update_size_button.clicked.connect(self.update_array_size)
 
+        self.algorithm_layout = QHBoxLayout()
+        self.central_layout.addLayout(self.algorithm_layout)
+
+        self.algorithm_layout.addWidget(QLabel("Algorithm:"))
+        self.algorithm_combobox = QComboBox()
+        self.algorithm_combobox.addItems(list(ALGORITHMS))
+        self.algorithm_layout.addWidget(self.algorithm_combobox)
+
+        self.algorithm_layout.addWidget(QLabel("Pivot:"))
+        self.pivot_combobox = QComboBox()
+        self.pivot_combobox.addItems(list(PIVOT_STRATEGIES))
+        self.pivot_combobox.setToolTip("Pivot selection strategy")
+        self.algorithm_layout.addWidget(self.pivot_combobox)
+
+        self.algorithm_layout.addWidget(QLabel("Partition:"))
+        self.partition_combobox = QComboBox()
+        self.partition_combobox.addItems(list(PARTITION_SCHEMES))
+        self.partition_combobox.setToolTip("Partition scheme")
+        self.algorithm_layout.addWidget(self.partition_combobox)
+
+        self.algorithm_layout.addWidget(QLabel("Insertion cutoff:"))
+        self.cutoff_spinbox = QSpinBox()
+        self.cutoff_spinbox.setRange(0, 1000)
+        self.cutoff_spinbox.setValue(16)
+        self.cutoff_spinbox.setToolTip("Introsort leaves ranges up to this size to insertion sort")
+        self.algorithm_layout.addWidget(self.cutoff_spinbox)
+        self.algorithm_layout.addStretch()
+
+        self.algorithm_combobox.currentTextChanged.connect(self.update_algorithm_controls)
+        self.update_algorithm_controls()
+
         self.buttons_layout = QHBoxLayout()
         self.central_layout.addLayout(self.buttons_layout)
 
@@ -60,19 +106,109 @@ class MainWindow(QMainWindow):
         self.auto_button.setDisabled(True)
         self.buttons_layout.addWidget(self.auto_button)
 
-        period_label = QLabel("Period:")
-        period_label.setAlignment(Qt.AlignCenter)
-        self.buttons_layout.addWidget(period_label)
+        self.race_button = QPushButton("Race...")
+        self.race_button.setToolTip("Compare several algorithms on the current input")
+        self.race_button.clicked.connect(self.open_race_window)
+        self.buttons_layout.addWidget(self.race_button)
+        self.race_window = None
+
+        speed_label = QLabel("Speed:")
+        speed_label.setAlignment(Qt.AlignCenter)
+        self.buttons_layout.addWidget(speed_label)
 
         self.speed_spinbox = QSpinBox()
-        self.speed_spinbox.setRange(1, 5000)
+        self.speed_spinbox.setRange(0, 10000000)
+        self.speed_spinbox.setValue(100)
+        self.speed_spinbox.setSuffix(" steps/s")
+        self.speed_spinbox.setSpecialValueText("Max")
+        self.speed_spinbox.setToolTip("Steps applied per second in automatic mode, 0 for as fast as possible")
         self.buttons_layout.addWidget(self.speed_spinbox)
 
+        self.stream_checkbox = QCheckBox("Stream steps")
+        self.stream_checkbox.setToolTip(
+            "Generate steps lazily while playing instead of computing them all on Start"
+        )
+        self.buttons_layout.addWidget(self.stream_checkbox)
+
         self.element_label_checkbox = QCheckBox("Show element value")
         self.element_label_checkbox.setChecked(True)
         self.element_label_checkbox.stateChanged.connect(self.empty_element_values)
         self.buttons_layout.addWidget(self.element_label_checkbox)
 
+        self.timeline_layout = QHBoxLayout()
+        self.central_layout.addLayout(self.timeline_layout)
+
+        self.step_back_button = QPushButton("Step back")
+        self.step_back_button.setDisabled(True)
+        self.timeline_layout.addWidget(self.step_back_button)
+
+        self.timeline_slider = QSlider(Qt.Horizontal)
+        self.timeline_slider.setDisabled(True)
+        self.timeline_layout.addWidget(self.timeline_slider, 1)
+
+        self.timeline_label = QLabel("0 / 0")
+        self.timeline_layout.addWidget(self.timeline_label)
+
+        self.timeline_layout.addWidget(QLabel("Snapshot every:"))
+        self.snapshot_interval_spinbox = QSpinBox()
+        self.snapshot_interval_spinbox.setRange(1, 1000000)
+        self.snapshot_interval_spinbox.setValue(1000)
+        self.snapshot_interval_spinbox.setSuffix(" steps")
+        self.timeline_layout.addWidget(self.snapshot_interval_spinbox)
+
+        self.snapshot_memory_spinbox = QSpinBox()
+        self.snapshot_memory_spinbox.setRange(1, 16384)
+        self.snapshot_memory_spinbox.setValue(64)
+        self.snapshot_memory_spinbox.setSuffix(" MB")
+        self.snapshot_memory_spinbox.setToolTip("Memory available for timeline snapshots")
+        self.timeline_layout.addWidget(self.snapshot_memory_spinbox)
+
+        self.timeline_layout.addWidget(QLabel("Trace cache:"))
+        self.trace_cache_spinbox = QSpinBox()
+        self.trace_cache_spinbox.setRange(0, 16384)
+        self.trace_cache_spinbox.setValue(256)
+        self.trace_cache_spinbox.setSuffix(" MB")
+        self.trace_cache_spinbox.setToolTip("Memory for finished traces, reused when the same input and settings start again")
+        self.trace_cache_spinbox.valueChanged.connect(self.update_trace_cache_limit)
+        self.timeline_layout.addWidget(self.trace_cache_spinbox)
+
+        self.save_trace_button = QPushButton("Save trace...")
+        self.save_trace_button.setDisabled(True)
+        self.save_trace_button.clicked.connect(self.save_trace)
+        self.timeline_layout.addWidget(self.save_trace_button)
+
+        self.open_trace_button = QPushButton("Open trace...")
+        self.open_trace_button.clicked.connect(self.open_trace)
+        self.timeline_layout.addWidget(self.open_trace_button)
+
+        self.fast_forward_layout = QHBoxLayout()
+        self.central_layout.addLayout(self.fast_forward_layout)
+        self.fast_forward_layout.addWidget(QLabel("Fast forward:"))
+
+        self.partition_end_button = QPushButton("End of partition")
+        self.partition_end_button.setDisabled(True)
+        self.fast_forward_layout.addWidget(self.partition_end_button)
+
+        self.depth_button = QPushButton("To depth")
+        self.depth_button.setDisabled(True)
+        self.fast_forward_layout.addWidget(self.depth_button)
+        self.depth_spinbox = QSpinBox()
+        self.depth_spinbox.setRange(1, 1000000)
+        self.depth_spinbox.setToolTip("Run until a partition at this recursion depth starts")
+        self.fast_forward_layout.addWidget(self.depth_spinbox)
+
+        self.step_index_button = QPushButton("To step")
+        self.step_index_button.setDisabled(True)
+        self.fast_forward_layout.addWidget(self.step_index_button)
+        self.step_index_spinbox = QSpinBox()
+        self.step_index_spinbox.setRange(0, 2**31 - 1)
+        self.fast_forward_layout.addWidget(self.step_index_spinbox)
+
+        self.finish_button = QPushButton("Finish")
+        self.finish_button.setDisabled(True)
+        self.fast_forward_layout.addWidget(self.finish_button)
+        self.fast_forward_layout.addStretch()
+
         self.splitter = QSplitter()
         self.splitter.setOrientation(Qt.Vertical)
         self.splitter.setStyleSheet(
@@ -88,16 +224,68 @@ class MainWindow(QMainWindow):
         self.start_button.clicked.connect(self.quicksort_widget.start_stop)
         self.next_step_button.clicked.connect(self.quicksort_widget.execute_next_step)
         self.auto_button.clicked.connect(self.quicksort_widget.run_auto)
+        self.step_back_button.clicked.connect(self.quicksort_widget.step_back)
+        self.timeline_slider.valueChanged.connect(self.quicksort_widget.seek)
+        self.partition_end_button.clicked.connect(self.quicksort_widget.run_to_partition_end)
+        self.depth_button.clicked.connect(
+            lambda: self.quicksort_widget.run_to_depth(self.depth_spinbox.value())
+        )
+        self.step_index_button.clicked.connect(
+            lambda: self.quicksort_widget.run_to_step(self.step_index_spinbox.value())
+        )
+        self.finish_button.clicked.connect(self.quicksort_widget.finish)
 
-        self.scroll_area_log = ScrollAreaBottom()
+        self.log_splitter = QSplitter()
         self.log = LogWidget(self)
-        self.splitter.addWidget(self.scroll_area_log)
-        self.scroll_area_log.setWidget(self.log)
+        self.log_splitter.addWidget(self.log)
+        self.metrics_widget = MetricsWidget(self.quicksort_widget)
+        # Scrolls instead of taking height away from the bars
+        self.metrics_scroll_area = QScrollArea()
+        self.metrics_scroll_area.setWidgetResizable(True)
+        self.metrics_scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.metrics_scroll_area.setWidget(self.metrics_widget)
+        self.metrics_scroll_area.setMinimumWidth(
+            self.metrics_widget.minimumSizeHint().width()
+            + self.metrics_scroll_area.verticalScrollBar().sizeHint().width()
+        )
+        self.log_splitter.addWidget(self.metrics_scroll_area)
+        self.log_splitter.setStretchFactor(0, 1)
+        self.splitter.addWidget(self.log_splitter)
+        self.splitter.setStretchFactor(0, 3)
+        self.splitter.setStretchFactor(1, 1)
+        self.splitter.setSizes([400, 200])
+
+        self.log_buttons_layout = QHBoxLayout()
+        self.central_layout.addLayout(self.log_buttons_layout)
 
         self.clear_log_button = QPushButton("Clear log")
-        self.central_layout.addWidget(self.clear_log_button)
+        self.log_buttons_layout.addWidget(self.clear_log_button, 1)
         self.clear_log_button.clicked.connect(self.log.clear)
-        self.resize(500, 600)
+
+        self.log_file_button = QPushButton("Write log to file...")
+        self.log_file_button.setCheckable(True)
+        self.log_buttons_layout.addWidget(self.log_file_button)
+        self.log_file_button.toggled.connect(self.toggle_log_file)
+
+        self.log_buttons_layout.addWidget(QLabel("Keep lines:"))
+        self.log_retention_spinbox = QSpinBox()
+        self.log_retention_spinbox.setRange(100, 1000000)
+        self.log_retention_spinbox.setSingleStep(1000)
+        self.log_retention_spinbox.setValue(10000)
+        self.log_retention_spinbox.editingFinished.connect(
+            lambda: self.log.set_retention(self.log_retention_spinbox.value())
+        )
+        self.log_buttons_layout.addWidget(self.log_retention_spinbox)
+        self.resize(1000, 800)
+
+    def update_trace_cache_limit(self):
+        self.quicksort_widget.trace_cache.set_memory_limit(self.trace_cache_spinbox.value() * 2**20)
+
+    def update_algorithm_controls(self):
+        algorithm = self.algorithm_combobox.currentText()
+        self.pivot_combobox.setEnabled(algorithm in CONFIGURABLE)
+        self.partition_combobox.setEnabled(algorithm in CONFIGURABLE)
+        self.cutoff_spinbox.setEnabled(algorithm == "introsort")
 
     def update_array_size(self):
         self.log.add_text(
@@ -110,13 +298,80 @@ class MainWindow(QMainWindow):
         self.quicksort_widget.number_of_elements = self.array_size_spinbox.value()
         self.quicksort_widget.create_elements()
 
-    def empty_element_values(self):
-        widgets = [self.quicksort_widget.layout_bars.itemAt(i).widget()
-                   for i in range(self.quicksort_widget.layout_bars.count())]
+    def toggle_log_file(self, checked: bool):
+        if not checked:
+            self.log.close_log_file()
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Write log to file", "log.txt")
+        if path:
+            self.log.open_log_file(path)
+        else:
+            self.log_file_button.setChecked(False)
+
+    def update_timeline_controls(self):
+        timeline = self.quicksort_widget.timeline
+        running = self.quicksort_widget.running and timeline is not None
+        seekable = running and timeline.seekable
+        position = self.quicksort_widget.state.position if running else 0
+        total = len(timeline) if seekable else "?"
+        if seekable and not timeline.trace.complete:
+            # Still being generated
+            total = f"{total}+"
+
+        self.timeline_slider.blockSignals(True)
+        self.timeline_slider.setMaximum(len(timeline) if seekable else 0)
+        self.timeline_slider.setValue(position)
+        self.timeline_slider.blockSignals(False)
+
+        self.timeline_slider.setEnabled(seekable)
+        self.step_back_button.setEnabled(seekable and position > 0)
+        self.save_trace_button.setEnabled(seekable)
+        playing = running and not self.quicksort_widget.sorted
+        # Heapsort works on the whole array, it has no partitions or depth
+        partitioned = playing and self.quicksort_widget.trace_settings.get("algorithm") != "heapsort"
+        for button in (self.partition_end_button, self.depth_button):
+            button.setEnabled(partitioned)
+        self.finish_button.setEnabled(playing)
+        self.step_index_button.setEnabled(playing or seekable)
+        self.timeline_label.setText(f"{position} / {total}" if running else "0 / 0")
 
-        if not self.element_label_checkbox.isChecked():
-            for w in widgets:
-                w.setText("")
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save trace", "trace.qqt", "Traces (*.qqt)")
+        if not path:
+            return
+        try:
+            self.quicksort_widget.save_trace(path)
+        except OSError as error:
+            QMessageBox.warning(self, "Save trace", str(error))
+
+    def open_trace(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open trace", "", "Traces (*.qqt)")
+        if not path:
+            return
+        try:
+            self.quicksort_widget.open_trace(path)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Open trace", str(error))
+
+    def open_race_window(self):
+        settings = (
+            self.quicksort_widget.number_of_elements,
+            self.input_combobox.currentText(),
+            self.input_seed_spinbox.value(),
+        )
+        if self.race_window is None:
+            self.race_window = RaceWindow(*settings)
         else:
-            for w in widgets:
-                w.update()
\ No newline at end of file
+            self.race_window.set_input(*settings)
+        self.race_window.show()
+        self.race_window.raise_()
+
+    def closeEvent(self, event):
+        self.log.close_log_file()
+        if self.race_window is not None:
+            self.race_window.close()
+        QMainWindow.closeEvent(self, event)
+
+    def empty_element_values(self):
+        self.quicksort_widget.canvas.set_show_values(self.element_label_checkbox.isChecked())
\ No newline at end of file
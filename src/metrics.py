@@ -0,0 +1,80 @@
+import csv
+from bisect import bisect_right
+from collections import deque
+from time import perf_counter
+
+from .timeline import SortState
+
+
+class Metrics:
+    # Rolling timing samples for the metrics panel. Rates are measured over
+    # the last second, histograms over the last SAMPLES samples.
+    SAMPLES = 1000
+    RATE_WINDOW = 1.0
+    # Histogram bin lower bounds in seconds, two bins per decade from 1 us to 1 s
+    BINS = [10 ** (i / 2 - 6) for i in range(13)]
+
+    def __init__(self):
+        self.step_times = deque(maxlen=self.SAMPLES)
+        self.paint_times = deque(maxlen=self.SAMPLES)
+        self.step_events = deque()
+        self.frame_events = deque()
+
+    def reset(self):
+        self.step_times.clear()
+        self.paint_times.clear()
+        self.step_events.clear()
+        self.frame_events.clear()
+
+    def record_steps(self, count: int, duration: float):
+        if count:
+            self.step_events.append((perf_counter(), count))
+            self.step_times.append(duration / count)
+
+    def record_paint(self, duration: float):
+        self.frame_events.append(perf_counter())
+        self.paint_times.append(duration)
+
+    def trim(self, now: float):
+        while self.step_events and now - self.step_events[0][0] > self.RATE_WINDOW:
+            self.step_events.popleft()
+        while self.frame_events and now - self.frame_events[0] > self.RATE_WINDOW:
+            self.frame_events.popleft()
+
+    def steps_per_second(self) -> float:
+        self.trim(perf_counter())
+        return sum(count for _, count in self.step_events) / self.RATE_WINDOW
+
+    def frames_per_second(self) -> float:
+        self.trim(perf_counter())
+        return len(self.frame_events) / self.RATE_WINDOW
+
+    @classmethod
+    def histogram(cls, samples) -> list:
+        counts = [0] * len(cls.BINS)
+        for sample in samples:
+            counts[max(bisect_right(cls.BINS, sample) - 1, 0)] += 1
+        return counts
+
+    def summary(self, state: SortState | None) -> dict:
+        return {
+            "steps": state.position if state else 0,
+            "comparisons": state.comparisons if state else 0,
+            "swaps": state.swaps if state else 0,
+            "depth": state.depth if state else 0,
+            "max_depth": state.max_depth if state else 0,
+            "steps_per_second": round(self.steps_per_second(), 1),
+            "frames_per_second": round(self.frames_per_second(), 1),
+        }
+
+    def write_csv(self, path: str, state: SortState | None):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["section", "name", "value"])
+            for name, value in self.summary(state).items():
+                writer.writerow(["summary", name, value])
+            for phase, count in (state.phase_steps() if state else {}).items():
+                writer.writerow(["phase_steps", phase, count])
+            for section, samples in (("step_time", self.step_times), ("paint_time", self.paint_times)):
+                for lower, count in zip(self.BINS, self.histogram(samples)):
+                    writer.writerow([section, f">={lower:.0e}s", count])
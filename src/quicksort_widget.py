@@ -1,26 +1,18 @@
-from random import shuffle
+from array import array
+from time import perf_counter
 
-from PySide6.QtCore import Qt, QTimer, QByteArray
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QColor
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
-from PySide6.QtMultimedia import *
-
-from .widgets import (
-    Element,
-    PivotMarker,
-    Marker,
-    PickGreenRed,
-    GreenGreaterPivot,
-    GreenLessEqPivot,
-    SwapGreenRed,
-    Pivot,
-    DecreaseGreen,
-    DecreaseRed,
-    SwapPivotRed,
-    GreenMarkerPlaceholder,
-    RedMarkerPlaceholder,
-    PivotPlaceholder,
-    RangeMarker,
-)
+
+from .engine import sort_steps
+from .inputs import check_values, generate_input
+from .metrics import Metrics
+from .timeline import SortState, Timeline
+from .trace import BackgroundTrace, Op, StepStream, Trace, describe
+from .trace_cache import TraceCache, trace_key
+from .trace_file import MappedTrace, open_trace, save_trace
+from .widgets import BarCanvas, MarkerRow, RangeMarker
 
 
 class DebugLayout(QHBoxLayout):
@@ -44,396 +36,350 @@ class DebugLayout(QHBoxLayout):
         QHBoxLayout.removeWidget(self, widget)
 
 
+# Steps that start working on a new range
+RANGE_OPS = (Op.PIVOT, Op.INSERTION_RANGE, Op.HEAPSORT_RANGE)
+
+
 class QuicksortWidget(QWidget):
+    FRAME_INTERVAL = 16  # ms, about 60 frames per second
+    FRAME_BUDGET = 0.012  # s spent applying steps per frame at maximum speed
+    MAX_SPEED_CHUNK = 256
+
     def __init__(self, main_window):
         QWidget.__init__(self)
         self.main_window = main_window
         self.number_of_elements = 6
         self.old_number_of_elements = 6
-        self.iteration = 1
-        self.markers_placed = False
         self.sorted = False
         self.running = False
 
-        self.elements = [
-            Element(self,
-                    value=i,
-                    number_of_elements=self.number_of_elements,
-                    parent_height=self.height(),
-                    parent_width=self.width()
-                    )
-            for i in range(1, self.number_of_elements + 1)
-        ]
-        self.steps = []
+        self.canvas = BarCanvas(range(1, self.number_of_elements + 1))
+        self.trace = Trace()
+        self.trace_settings = None
+        self.trace_key = None
+        self.trace_cache = TraceCache(self.main_window.trace_cache_spinbox.value() * 2**20)
+        self.input_values = None
+        self.state = SortState(self.canvas.values)
+        self.timeline = None
+        self.metrics = Metrics()
+        self.canvas.metrics = self.metrics
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(self.FRAME_INTERVAL)
+        self.frame_timer.timeout.connect(self.play_frame)
+        self.last_frame = 0.0
+        self.step_credit = 0.0
 
         self.central_layout = QVBoxLayout()
         self.central_layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(self.central_layout)
 
-        self.layout_pivot_marker = QHBoxLayout()
-        self.central_layout.addLayout(self.layout_pivot_marker)
+        self.pivot_marker = MarkerRow(self.canvas, QColor("yellow"))
+        self.green_marker = MarkerRow(self.canvas, QColor(0, 255, 0))
+        self.red_marker = MarkerRow(self.canvas, QColor(255, 77, 77))
+        self.blue_marker = MarkerRow(self.canvas, QColor(80, 80, 255))
+        self.blue_marker.hide()
 
-        self.layout_bars = QHBoxLayout()
-        self.layout_green_marker = QHBoxLayout()
-        self.layout_red_marker = QHBoxLayout()
-        self.central_layout.addLayout(self.layout_bars, stretch=1)
+        self.central_layout.addWidget(self.pivot_marker)
+        self.central_layout.addWidget(self.canvas, stretch=1)
 
         self.start_index, self.end_index = 0, self.number_of_elements-1
 
-        self.range_marker = RangeMarker(self.width(), self.width()//self.number_of_elements, self.start_index, self.end_index)
+        self.range_marker = RangeMarker(self.canvas, self.start_index, self.end_index)
         self.central_layout.addWidget(self.range_marker)
 
-        self.central_layout.addLayout(self.layout_green_marker)
-        self.central_layout.addLayout(self.layout_red_marker)
-
-        self.values = [element.value for element in self.elements]
-
-        self.pivot_marker = PivotMarker(0)
-        self.green_marker = Marker("green", self.number_of_elements - 1)
-        self.red_marker = Marker("red", self.number_of_elements - 1)
+        self.central_layout.addWidget(self.green_marker)
+        self.central_layout.addWidget(self.red_marker)
+        self.central_layout.addWidget(self.blue_marker)
 
         self.create_elements()
 
-    def mark_pivot(self, step: Pivot):
-        # todo calculate pivot position
-        self.pivot_marker = PivotMarker(0)
-        ph = self.layout_pivot_marker.takeAt(0)
-        self.layout_pivot_marker.removeWidget(ph.widget())
-        ph.widget().deleteLater()
-        self.layout_pivot_marker.insertWidget(
-            self.pivot_marker.position, self.pivot_marker, 1
-        )
-
-        self.log(f"Pivot: {self.layout_bars.itemAt(step.index).widget().value}")
-
-    def swap_pivot(self, step: Pivot):
-        self.swap_widgets(
-            self.layout_pivot_marker,
-            self.layout_pivot_marker.itemAt(step.index).widget(),
-            self.layout_pivot_marker.itemAt(self.pivot_marker.position).widget(),
-        )
-        self.range_marker.start, self.range_marker.end = step.start, step.end
-        self.range_marker.update()
-        self.log(f"Pivot: {self.layout_bars.itemAt(step.index).widget().value}")
-
     def start_stop(self):
         if self.main_window.start_button.text() == "Start":
-            self.sorted = False
-            self.running = True
-
-            self.main_window.log.clear()
-            self.main_window.start_button.setText("Stop")
-            self.main_window.shuffle_button.setDisabled(True)
-            self.main_window.update_size_button.setDisabled(True)
-            self.log("--- Start ---")
-            self.main_window.next_step_button.setEnabled(True)
-            self.main_window.auto_button.setEnabled(True)
-
-            v = [element.value for element in self.elements]
-            self.values = [element.value for element in self.elements]
-            self.steps = []
-            self.values = self.quicksort(v, 0, len(v) - 1)
-            # from pprint import pprint
-            # pprint(self.steps)
-            self.execute_next_step()
+            settings = self.settings()
+            key = trace_key(self.canvas.values, settings)
+            trace = self.trace_cache.get(key)
+            if trace is not None:
+                self.start_sorting(trace, settings, key)
+                self.log(f"Reusing {len(trace)} cached steps")
+                return
+
+            v = list(self.canvas.values)
+            steps = sort_steps(
+                v,
+                settings["algorithm"],
+                settings["pivot"],
+                settings["seed"],
+                settings["partition"],
+                settings["cutoff"],
+            )
+            if self.main_window.stream_checkbox.isChecked():
+                trace = StepStream(steps)
+            else:
+                # Generated by a worker thread while playing, so large sorts
+                # start right away
+                trace = BackgroundTrace(steps)
+            self.start_sorting(trace, settings, key)
         else:
             self.stop_sorting()
             self.main_window.start_button.setText("Start")
             self.log("--- Stop ---")
             self.main_window.next_step_button.setDisabled(True)
+            self.pause_auto()
             self.main_window.auto_button.setDisabled(True)
             self.main_window.shuffle_button.setEnabled(True)
             self.main_window.update_size_button.setEnabled(True)
-            self.iteration = 1
-
-    @staticmethod
-    def swap_widgets(layout: QHBoxLayout | QVBoxLayout, w1, w2, log=False, align=None):
-        if w1 == w2:
-            return
-
-        # if log:
-        #     print("Layout ", layout, ":")
-        #     for i in range(layout.count()):
-        #         print(layout.itemAt(i).widget())
-        #     print("i start:", layout.indexOf(w1), layout.indexOf(w2))
-        #     print("w pos:", w1.position, w2.position)
-
-        w1.position, w2.position = w2.position, w1.position
-
-        widgets = []
-        while layout.count():
-            w = layout.takeAt(0).widget()
-            widgets.append(w)
-
-        widgets.sort(key=lambda w: w.position)
-        for w in widgets:
-            if align:
-                layout.addWidget(w, 1, align)
-            else:
-                layout.addWidget(w, 1)
-
-    def log(self, text: str):
-        self.main_window.log.add_text(text)
-
-    def pick_green_red(self, step: PickGreenRed):
-        if self.green_marker is None:
-            self.green_marker = Marker("green", self.number_of_elements - 1)
-        if self.red_marker is None:
-            self.red_marker = Marker("red", self.number_of_elements - 1)
-
-        green = self.layout_green_marker.takeAt(step.green_index).widget()
-        self.layout_green_marker.insertWidget(step.green_index, self.green_marker, 1)
-        green.deleteLater()
-
-        red = self.layout_red_marker.takeAt(step.red_index).widget()
-        self.layout_red_marker.insertWidget(step.red_index, self.red_marker, 1)
-        red.deleteLater()
-
-        self.log(f"Green: {step.green_value} Red: {step.red_value}")
+            self.main_window.update_timeline_controls()
+
+    def settings(self) -> dict:
+        # Everything needed to generate the same trace again from the input
+        return {
+            "algorithm": self.main_window.algorithm_combobox.currentText(),
+            "pivot": self.main_window.pivot_combobox.currentText(),
+            "seed": 0,
+            "partition": self.main_window.partition_combobox.currentText(),
+            "cutoff": self.main_window.cutoff_spinbox.value(),
+        }
+
+    def start_sorting(self, trace, settings: dict, key: str | None = None):
+        # `key` is the trace_key of a generated trace, which is cached when
+        # it is complete by the time sorting stops
+        self.sorted = False
+        self.running = True
 
-    def swap_markers(self, step: PickGreenRed):
-        self.layout_green_marker.log = True
-        self.swap_widgets(
-            self.layout_green_marker,
-            self.green_marker,
-            self.layout_green_marker.itemAt(step.green_index).widget(),
+        self.main_window.log.clear()
+        self.main_window.start_button.setText("Stop")
+        self.main_window.shuffle_button.setDisabled(True)
+        self.main_window.update_size_button.setDisabled(True)
+        self.log("--- Start ---")
+        self.main_window.next_step_button.setEnabled(True)
+        self.main_window.auto_button.setEnabled(True)
+
+        self.blue_marker.setVisible(
+            settings.get("partition") == "three_way" or settings.get("algorithm") == "dual_pivot"
         )
-
-        self.swap_widgets(
-            self.layout_red_marker,
-            self.red_marker,
-            self.layout_red_marker.itemAt(step.red_index).widget(),
+        self.input_values = array("i", self.canvas.values)
+        self.trace_settings = settings
+        self.trace_key = key
+        self.trace = trace
+        self.state = SortState(self.canvas.values)
+        self.metrics.reset()
+        self.timeline = Timeline(
+            self.trace,
+            self.state,
+            interval=self.main_window.snapshot_interval_spinbox.value(),
+            memory_limit=self.main_window.snapshot_memory_spinbox.value() * 2**20,
         )
-        self.log(f"Green: {step.green_value} Red: {step.red_value}")
-
-    def green_less_eq_pivot(self, step: GreenLessEqPivot):
-        self.log(f"Green {step.green_value} <= {step.pivot_value}")
+        self.main_window.update_timeline_controls()
+        self.execute_next_step()
+
+    def save_trace(self, path: str):
+        if isinstance(self.trace, BackgroundTrace):
+            # Waits for the worker to generate the remaining steps
+            while self.trace.receive():
+                pass
+        save_trace(path, self.input_values, self.trace, self.trace_settings)
+        self.log(f"Saved {len(self.trace)} steps to {path}")
+
+    def open_trace(self, path: str):
+        values, settings, trace = open_trace(path)
+        try:
+            check_values(values)
+        except ValueError:
+            trace.close()
+            raise
+        if self.running:
+            self.start_stop()
+
+        self.number_of_elements = len(values)
+        self.main_window.array_size_spinbox.setValue(len(values))
+        self.create_elements()
+        self.canvas.set_values(values)
+        self.main_window.algorithm_combobox.setCurrentText(settings.get("algorithm", "quicksort"))
+        self.main_window.cutoff_spinbox.setValue(settings.get("cutoff", 16))
+        self.main_window.pivot_combobox.setCurrentText(settings.get("pivot", "first"))
+        self.main_window.partition_combobox.setCurrentText(settings.get("partition", "green_red"))
+        self.start_sorting(trace, settings)
+        self.log(f"Opened {len(trace)} steps from {path}")
 
-    def decrease_green_marker(self):
-        if self.green_marker.position > 0:
-            self.swap_widgets(
-                self.layout_green_marker,
-                self.green_marker,
-                self.layout_green_marker.itemAt(self.green_marker.position - 1).widget()
-            )
+    def log(self, text: str):
+        self.main_window.log.add_text(text)
 
-            self.log("Decrease green marker")
-        else:
-            print("Green underflow")
-
-    def decrease_red_marker(self):
-        if self.red_marker.position > 0:
-            self.swap_widgets(
-                self.layout_red_marker,
-                self.red_marker,
-                self.layout_red_marker.itemAt(self.red_marker.position - 1).widget(),
-            )
-            self.log("Decrease red marker")
+    def show_state(self, dirty=None):
+        # Brings the canvas and the markers in line with self.state. Only
+        # the columns in `dirty` are repainted, or all of them when None.
+        if dirty is None:
+            self.canvas.update_all()
         else:
-            print("Red underflow")
+            self.canvas.update_columns(dirty)
 
-    def green_greater_pivot(self, step: GreenGreaterPivot):
-        self.log(f"Green > pivot: {step.green_value} > {step.pivot_value}")
-
-    def swap_green_red(self, step: SwapGreenRed):
-        self.swap_widgets(
-            self.layout_bars,
-            self.layout_bars.itemAt(self.green_marker.position).widget(),
-            self.layout_bars.itemAt(self.red_marker.position).widget(),
-            align=Qt.AlignBottom
-        )
-        self.log(f"Swapping green <-> red: {step.green_value} <-> {step.red_value}")
-
-    def swap_pivot_red(self, step: SwapPivotRed):
-        self.swap_widgets(
-            self.layout_bars,
-            self.layout_bars.itemAt(step.pivot_index).widget(),
-            self.layout_bars.itemAt(self.red_marker.position).widget(),
-            align=Qt.AlignBottom
-        )
+        self.pivot_marker.move_to(self.state.pivot)
+        self.green_marker.move_to(self.state.green)
+        self.red_marker.move_to(self.state.red)
+        self.blue_marker.move_to(self.state.blue)
 
-        self.log(f"Swapping pivot <-> red: {step.pivot_value} <-> {step.red_value}")
+        if (self.range_marker.start, self.range_marker.end) != (self.state.start, self.state.end):
+            self.range_marker.start, self.range_marker.end = self.state.start, self.state.end
+            self.range_marker.update()
 
     def execute_next_step(self):
+        self.advance(1)
+
+    def advance(self, count: int) -> int:
+        # Applies up to `count` steps to the state, then updates the view
+        # once with every column that changed along the way.
         if not self.running:
+            return 0
+
+        start = perf_counter()
+        applied = 0
+        changed = set()
+        while applied < count:
+            step, dirty = self.timeline.step()
+            if step is None:
+                self.sorted = True
+                break
+
+            changed.update(dirty)
+            self.log(describe(*step))
+            applied += 1
+
+        self.metrics.record_steps(applied, perf_counter() - start)
+        self.show_state(changed)
+        self.main_window.update_timeline_controls()
+        return applied
+
+    def seek(self, index: int):
+        if not self.running or not self.timeline.seekable:
+            return
+        if index == self.state.position:
             return
 
-        if self.steps:
-            step = self.steps.pop(0)
-        else:
-            self.sorted = True
+        self.timeline.seek(index)
+        self.sorted = self.trace.complete and self.state.position == len(self.trace)
+        self.show_state()
+        self.log(f"Jumped to step {self.state.position}")
+        self.main_window.update_timeline_controls()
+
+    def fast_forward(self, stop=None, limit: int | None = None):
+        # Applies steps straight to the state, without logging or painting
+        # them, then shows the result once
+        if not self.running or self.sorted:
             return
-        # print("Executing", step)
-        match step:
-            case Pivot():
-                if self.iteration == 1:
-                    self.mark_pivot(step)
-                    self.iteration += 1
-                else:
-                    self.swap_pivot(step)
-            case PickGreenRed():
-                if not self.markers_placed:
-                    self.markers_placed = True
-                    self.pick_green_red(step)
-                else:
-                    self.swap_markers(step)
-            case GreenLessEqPivot():
-                self.green_less_eq_pivot(step)
-            case GreenGreaterPivot():
-                self.green_greater_pivot(step)
-            case SwapGreenRed():
-                self.swap_green_red(step)
-            case SwapPivotRed():
-                self.swap_pivot_red(step)
-            case DecreaseGreen():
-                self.decrease_green_marker()
-            case DecreaseRed():
-                self.decrease_red_marker()
-        self.main_window.scroll_area_log.move_bottom()
+        self.pause_auto()
+
+        start = perf_counter()
+        applied = self.timeline.fast_forward(stop, limit)
+        self.metrics.record_steps(applied, perf_counter() - start)
+        self.sorted = self.trace.peek() is None
+        self.show_state()
+        self.log(f"Fast forwarded {applied} steps to step {self.state.position}")
+        self.main_window.update_timeline_controls()
+
+    def run_to_partition_end(self):
+        # Stops right before the next range starts, whether it is partitioned
+        # or handed to insertion sort or heapsort
+        self.fast_forward(lambda state: (step := self.trace.peek()) is None or step[0] in RANGE_OPS)
+
+    def run_to_depth(self, depth: int):
+        # Stops when a partition at `depth` starts, not counting the current one
+        current = self.state.ranges[-1] if self.state.ranges else None
+        self.fast_forward(lambda state: state.depth == depth and state.ranges[-1] is not current)
+
+    def run_to_step(self, index: int):
+        if self.timeline is not None and self.timeline.seekable:
+            self.seek(index)
+        elif index > self.state.position:
+            self.fast_forward(limit=index - self.state.position)
+
+    def finish(self):
+        self.fast_forward()
+
+    def step_back(self):
+        self.seek(self.state.position - 1)
 
     def play_noise(self):
         pass
 
     def run_auto(self):
-        self.main_window.auto_button.setDisabled(True)
-        if not self.sorted and self.running:
-            self.execute_next_step()
-            QTimer.singleShot(self.main_window.speed_spinbox.value(), lambda: self.run_auto())
-
-    def quicksort(self, v: list, start: int, end: int):
-        if start == end:
-            return []
-        elif start == end + 1:
-            return v
-
-        pivot_value = v[start]
-        pivot_index = v.index(pivot_value)
-
-        self.steps.append(Pivot(pivot_index, pivot_value, start, end))
-
-        green = end
-        red = end
-
-        self.steps.append(PickGreenRed(green, v[green], red, v[red]))
-
-        while green > start:
-            if pivot_value < v[green]:
-                self.steps.append(
-                    GreenGreaterPivot(green, v[green], pivot_index, pivot_value)
-                )
-
-                self.steps.append(SwapGreenRed(green, v[green], red, v[red]))
-                v[green], v[red] = v[red], v[green]
-
-                red -= 1
-                self.steps.append(DecreaseRed())
-            else:
-                self.steps.append(
-                    GreenLessEqPivot(green, v[green], pivot_index, pivot_value)
-                )
-
-            green -= 1
-            self.steps.append(DecreaseGreen())
-
-        self.steps.append(SwapPivotRed(pivot_index, pivot_value, red, v[red]))
-        v[start], v[red] = v[red], v[start]
-
-        self.quicksort(v, start, red - 1)
-        self.quicksort(v, red + 1, end)
-
-    def resizeEvent(self, event):
-        QWidget.resizeEvent(self, event)
-        for element in self.elements:
-            element.parent_height = self.layout_bars.geometry().height()
-            element.updateGeometry()
-
-        self.range_marker.layout_width = self.width()
-        self.range_marker.num_elements = self.number_of_elements
-        self.range_marker.update()
-
-    def delete_elements(self):
-        for i in range(self.old_number_of_elements - 1, -1, -1):
-            w = self.layout_bars.itemAt(i)
-            if w:
-                w = w.widget()
-                self.layout_bars.removeWidget(w)
-                w.deleteLater()
-
-    @staticmethod
-    def fill_layout(layout, widget, count: int):
-        for i in range(count):
-            w = widget(i)
-            layout.addWidget(w, 1)
-
-    @staticmethod
-    def empty_layout(layout):
-        w = layout.takeAt(0)
-        while w:
-            w.widget().deleteLater()
-            w = layout.takeAt(0)
+        if self.frame_timer.isActive():
+            self.pause_auto()
+        elif not self.sorted and self.running:
+            self.last_frame = perf_counter()
+            self.step_credit = 0.0
+            self.frame_timer.start()
+            self.main_window.auto_button.setText("Pause")
+
+    def pause_auto(self):
+        self.frame_timer.stop()
+        self.main_window.auto_button.setText("Automatic mode")
+
+    def play_frame(self):
+        now = perf_counter()
+        speed = self.main_window.speed_spinbox.value()
+
+        if speed == 0:
+            # As fast as possible
+            count = None
+        else:
+            self.step_credit += (now - self.last_frame) * speed
+            count = int(self.step_credit)
+            self.step_credit -= count
+
+        # Steps are applied until the frame budget is spent. What is left is
+        # dropped instead of carried over, so a slow frame does not make the
+        # next one even longer.
+        while count is None or count > 0:
+            if perf_counter() - now >= self.FRAME_BUDGET:
+                self.step_credit = 0.0
+                break
+            chunk = self.MAX_SPEED_CHUNK if count is None else min(count, self.MAX_SPEED_CHUNK)
+            if self.advance(chunk) < chunk:
+                break
+            if count is not None:
+                count -= chunk
+
+        self.last_frame = now
+        if self.sorted or not self.running:
+            self.pause_auto()
 
     def create_elements(self):
-        self.empty_layout(self.layout_bars)
-
-        self.elements = [
-            Element(self,
-                    value=i,
-                    number_of_elements=self.number_of_elements,
-                    parent_height=self.height(),
-                    parent_width=self.width()
-                    )
-            for i in range(1, self.number_of_elements + 1)
-        ]
-
-        self.empty_layout(self.layout_pivot_marker)
-        self.fill_layout(
-            self.layout_pivot_marker, PivotPlaceholder, self.number_of_elements
-        )
-
-        self.empty_layout(self.layout_red_marker)
-        self.fill_layout(
-            self.layout_red_marker, RedMarkerPlaceholder, self.number_of_elements
-        )
-
-        self.empty_layout(self.layout_green_marker)
-        self.fill_layout(
-            self.layout_green_marker, GreenMarkerPlaceholder, self.number_of_elements
-        )
-
-        self.pivot_marker.position = 0
-        self.green_marker.position = self.number_of_elements - 1
-        self.red_marker.position = self.number_of_elements - 1
-
-        # self.update_green_marker()
-        # self.update_red_marker()
-
-        for element in self.elements:
-            self.layout_bars.addWidget(element, 1)
-            self.layout_bars.setAlignment(element, Qt.AlignBottom)
-
-        self.range_marker.layout_width = self.width()
-        self.range_marker.num_elements = self.number_of_elements
+        self.canvas.set_values(range(1, self.number_of_elements + 1))
+
+        self.pivot_marker.move_to(None)
+        self.green_marker.move_to(None)
+        self.red_marker.move_to(None)
+        self.blue_marker.move_to(None)
+        self.pivot_marker.update()
+        self.green_marker.update()
+        self.red_marker.update()
+        self.blue_marker.update()
+
+        self.range_marker.start = 0
         self.range_marker.end = self.number_of_elements - 1
+        self.range_marker.update()
 
     def stop_sorting(self):
-        if self.red_marker:
-            self.layout_red_marker.replaceWidget(self.red_marker, RedMarkerPlaceholder(self.red_marker.position))
-            self.red_marker.deleteLater()
-            self.red_marker = None
-
-        if self.green_marker:
-            self.layout_green_marker.replaceWidget(self.green_marker,
-                                                   GreenMarkerPlaceholder(self.green_marker.position))
-            self.green_marker.deleteLater()
-            self.green_marker = None
-
-        self.markers_placed = False
-
-        if self.pivot_marker:
-            self.layout_pivot_marker.replaceWidget(self.pivot_marker, PivotPlaceholder(self.pivot_marker.position))
-            self.pivot_marker.deleteLater()
-            self.pivot_marker = None
-
+        if isinstance(self.trace, BackgroundTrace):
+            # Chunks the worker has already queued are taken before it is
+            # cancelled, which completes any trace that fits in the queue
+            for _ in range(self.trace.queue.maxsize):
+                if not self.trace.receive(block=False):
+                    break
+            self.trace.cancel()
+        elif isinstance(self.trace, MappedTrace):
+            self.trace.close()
+        if self.trace_key is not None and isinstance(self.trace, Trace):
+            self.trace_cache.put(self.trace_key, self.trace)
+        if self.input_values is not None:
+            # Back to the input of the run, so starting again with the same
+            # settings finds its trace in the cache
+            self.canvas.set_values(self.input_values)
+            self.sorted = False
+        self.pivot_marker.move_to(None)
+        self.green_marker.move_to(None)
+        self.red_marker.move_to(None)
+        self.blue_marker.move_to(None)
         self.running = False
 
     def shuffle(self):
@@ -441,18 +387,8 @@ class QuicksortWidget(QWidget):
 
         self.main_window.log.clear()
 
-        new_positions = list(range(self.number_of_elements))
-        shuffle(new_positions)
-
-        for position, element in zip(new_positions, self.elements):
-            element.update_position(position)
-
-        while self.layout_bars.count():
-            self.layout_bars.removeWidget(self.layout_bars.itemAt(0).widget())
-
-        self.elements.sort(key=lambda x: x.position)
-
-        for element in self.elements:
-            self.layout_bars.addWidget(element, 1, Qt.AlignBottom)
+        distribution = self.main_window.input_combobox.currentText()
+        seed = self.main_window.input_seed_spinbox.value()
+        self.canvas.set_values(generate_input(distribution, self.number_of_elements, seed))
 
-        self.main_window.log.add_text(f"Suffled {self.number_of_elements} elements")
+        self.main_window.log.add_text(f"Created {self.number_of_elements} elements: {distribution}, seed {seed}")
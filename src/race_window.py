@@ -0,0 +1,400 @@
+from time import perf_counter
+
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import (
+    QMainWindow,
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QComboBox,
+    QScrollArea,
+)
+
+from .engine import ALGORITHMS, CONFIGURABLE, PARTITION_SCHEMES, PIVOT_STRATEGIES, sort_steps
+from .inputs import INPUT_DISTRIBUTIONS, generate_input
+from .timeline import SortState
+from .trace import StepStream
+from .widgets import BarCanvas, MarkerRow
+
+DEFAULT_LANES = [
+    ("quicksort", "first", "green_red"),
+    ("quicksort", "median3", "hoare"),
+    ("introsort", "median3", "hoare"),
+    ("dual_pivot", "first", "green_red"),
+    ("heapsort", "first", "green_red"),
+]
+
+
+class RaceLane(QWidget):
+    # One contestant of the race: its own settings, canvas and state
+    def __init__(self, race_window, algorithm: str, pivot: str, partition: str):
+        QWidget.__init__(self)
+        self.race_window = race_window
+        self.state = None
+        self.steps = None
+        self.finished = False
+        self.finish_time = None
+        self.place = None
+
+        self.central_layout = QVBoxLayout()
+        self.central_layout.setContentsMargins(0, 0, 0, 0)
+        self.central_layout.setSpacing(2)
+        self.setLayout(self.central_layout)
+
+        self.header_layout = QHBoxLayout()
+        self.central_layout.addLayout(self.header_layout)
+
+        self.algorithm_combobox = QComboBox()
+        self.algorithm_combobox.addItems(list(ALGORITHMS))
+        self.algorithm_combobox.setCurrentText(algorithm)
+        self.algorithm_combobox.currentTextChanged.connect(self.update_settings)
+        self.header_layout.addWidget(self.algorithm_combobox)
+
+        self.pivot_combobox = QComboBox()
+        self.pivot_combobox.addItems(list(PIVOT_STRATEGIES))
+        self.pivot_combobox.setCurrentText(pivot)
+        self.pivot_combobox.setToolTip("Pivot selection strategy")
+        self.header_layout.addWidget(self.pivot_combobox)
+
+        self.partition_combobox = QComboBox()
+        self.partition_combobox.addItems(list(PARTITION_SCHEMES))
+        self.partition_combobox.setCurrentText(partition)
+        self.partition_combobox.setToolTip("Partition scheme")
+        self.partition_combobox.currentTextChanged.connect(self.update_settings)
+        self.header_layout.addWidget(self.partition_combobox)
+
+        self.cutoff_spinbox = QSpinBox()
+        self.cutoff_spinbox.setRange(0, 1000)
+        self.cutoff_spinbox.setValue(16)
+        self.cutoff_spinbox.setPrefix("cutoff ")
+        self.cutoff_spinbox.setToolTip("Introsort leaves ranges up to this size to insertion sort")
+        self.header_layout.addWidget(self.cutoff_spinbox)
+
+        self.status_label = QLabel()
+        self.header_layout.addWidget(self.status_label, 1)
+
+        self.remove_button = QPushButton("Remove")
+        self.remove_button.clicked.connect(lambda: self.race_window.remove_lane(self))
+        self.header_layout.addWidget(self.remove_button)
+
+        self.canvas = BarCanvas(race_window.values)
+        self.pivot_marker = MarkerRow(self.canvas, QColor("yellow"))
+        self.green_marker = MarkerRow(self.canvas, QColor(0, 255, 0))
+        self.red_marker = MarkerRow(self.canvas, QColor(255, 77, 77))
+        self.blue_marker = MarkerRow(self.canvas, QColor(80, 80, 255))
+
+        self.central_layout.addWidget(self.pivot_marker)
+        self.central_layout.addWidget(self.canvas, stretch=1)
+        self.central_layout.addWidget(self.green_marker)
+        self.central_layout.addWidget(self.red_marker)
+        self.central_layout.addWidget(self.blue_marker)
+
+        self.update_settings()
+        self.show_status()
+
+    @property
+    def name(self) -> str:
+        algorithm = self.algorithm_combobox.currentText()
+        if algorithm not in CONFIGURABLE:
+            return algorithm
+        settings = f"{self.pivot_combobox.currentText()}, {self.partition_combobox.currentText()}"
+        if algorithm == "introsort":
+            settings += f", cutoff {self.cutoff_spinbox.value()}"
+        return f"{algorithm} ({settings})"
+
+    def update_settings(self):
+        algorithm = self.algorithm_combobox.currentText()
+        self.pivot_combobox.setEnabled(algorithm in CONFIGURABLE)
+        self.partition_combobox.setEnabled(algorithm in CONFIGURABLE)
+        self.cutoff_spinbox.setEnabled(algorithm == "introsort")
+        self.blue_marker.setVisible(
+            algorithm == "dual_pivot"
+            or algorithm in CONFIGURABLE and self.partition_combobox.currentText() == "three_way"
+        )
+
+    def set_running(self, running: bool):
+        for widget in (self.algorithm_combobox, self.remove_button):
+            widget.setDisabled(running)
+        configurable = not running and self.algorithm_combobox.currentText() in CONFIGURABLE
+        self.pivot_combobox.setEnabled(configurable)
+        self.partition_combobox.setEnabled(configurable)
+        self.cutoff_spinbox.setEnabled(not running and self.algorithm_combobox.currentText() == "introsort")
+
+    def start(self, values):
+        self.canvas.set_values(values)
+        self.state = SortState(self.canvas.values)
+        self.steps = StepStream(
+            sort_steps(
+                list(values),
+                self.algorithm_combobox.currentText(),
+                self.pivot_combobox.currentText(),
+                partition=self.partition_combobox.currentText(),
+                cutoff=self.cutoff_spinbox.value(),
+            )
+        )
+        self.finished = False
+        self.finish_time = None
+        self.place = None
+        self.show_state()
+
+    def reset(self, values):
+        self.state = None
+        self.steps = None
+        self.finished = False
+        self.canvas.set_values(values)
+        self.show_state()
+
+    def advance(self, count: int, clock: float) -> int:
+        # Applies up to `count` steps. `clock` is the race time, recorded as
+        # the completion time when the last step has been applied.
+        if self.finished or self.state is None:
+            return 0
+
+        applied = 0
+        changed = set()
+        apply = self.state.apply
+        while applied < count:
+            step = self.steps.next()
+            if step is None:
+                self.finished = True
+                self.finish_time = clock
+                break
+            changed.update(apply(*step))
+            applied += 1
+
+        self.canvas.update_columns(changed)
+        self.show_state()
+        return applied
+
+    def show_state(self):
+        state = self.state
+        running = state is not None and not self.finished
+        self.pivot_marker.move_to(state.pivot if running else None)
+        self.green_marker.move_to(state.green if running else None)
+        self.red_marker.move_to(state.red if running else None)
+        self.blue_marker.move_to(state.blue if running else None)
+        self.show_status()
+
+    def show_status(self):
+        state = self.state
+        if state is None:
+            self.status_label.setText("")
+            return
+
+        text = f"{state.position} steps, {state.comparisons} comparisons, {state.swaps} swaps"
+        if self.finished:
+            text = f"#{self.place}: {text}, finished in {self.finish_time:.2f} s"
+        self.status_label.setText(text)
+
+
+class RaceWindow(QMainWindow):
+    # Several sorting algorithms on the same input, played by one clock.
+    # Every lane gets the same number of steps per frame, so the order in
+    # which they finish is the order of their step counts.
+    FRAME_INTERVAL = 16  # ms
+    FRAME_BUDGET = 0.012  # s spent applying steps per frame at maximum speed
+
+    def __init__(self, number_of_elements: int = 60, distribution: str = "random", seed: int = 0):
+        QMainWindow.__init__(self)
+        self.setWindowTitle("Quicksort GUI - Race")
+        self.lanes = []
+        self.input_settings = (number_of_elements, distribution, seed)
+        self.values = generate_input(distribution, number_of_elements, seed)
+        self.running = False
+        self.clock = 0.0
+        self.last_frame = 0.0
+        self.step_credit = 0.0
+        self.max_speed_chunk = 64
+        self.finished_lanes = 0
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(self.FRAME_INTERVAL)
+        self.frame_timer.timeout.connect(self.play_frame)
+
+        self.central_layout = QVBoxLayout()
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.central_widget.setLayout(self.central_layout)
+
+        self.controls_layout = QHBoxLayout()
+        self.central_layout.addLayout(self.controls_layout)
+
+        self.controls_layout.addWidget(QLabel("Number of elements:"))
+        self.array_size_spinbox = QSpinBox()
+        self.array_size_spinbox.setRange(2, 1000000)
+        self.array_size_spinbox.setValue(number_of_elements)
+        self.controls_layout.addWidget(self.array_size_spinbox)
+
+        self.controls_layout.addWidget(QLabel("Input:"))
+        self.input_combobox = QComboBox()
+        self.input_combobox.addItems(list(INPUT_DISTRIBUTIONS))
+        self.input_combobox.setCurrentText(distribution)
+        self.controls_layout.addWidget(self.input_combobox)
+
+        self.controls_layout.addWidget(QLabel("Seed:"))
+        self.input_seed_spinbox = QSpinBox()
+        self.input_seed_spinbox.setRange(0, 2**31 - 1)
+        self.input_seed_spinbox.setValue(seed)
+        self.controls_layout.addWidget(self.input_seed_spinbox)
+
+        self.create_input_button = QPushButton("Create input")
+        self.create_input_button.clicked.connect(self.create_input)
+        self.controls_layout.addWidget(self.create_input_button)
+
+        self.add_lane_button = QPushButton("Add lane")
+        self.add_lane_button.clicked.connect(lambda: self.add_lane(*DEFAULT_LANES[0]))
+        self.controls_layout.addWidget(self.add_lane_button)
+
+        self.controls_layout.addStretch()
+
+        self.start_button = QPushButton("Start")
+        self.start_button.clicked.connect(self.start_stop)
+        self.controls_layout.addWidget(self.start_button)
+
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.setDisabled(True)
+        self.pause_button.clicked.connect(self.pause_resume)
+        self.controls_layout.addWidget(self.pause_button)
+
+        self.controls_layout.addWidget(QLabel("Speed:"))
+        self.speed_spinbox = QSpinBox()
+        self.speed_spinbox.setRange(0, 10000000)
+        self.speed_spinbox.setValue(100)
+        self.speed_spinbox.setSuffix(" steps/s")
+        self.speed_spinbox.setSpecialValueText("Max")
+        self.speed_spinbox.setToolTip("Steps applied to every lane per second, 0 for as fast as possible")
+        self.controls_layout.addWidget(self.speed_spinbox)
+
+        self.lanes_widget = QWidget()
+        self.lanes_layout = QVBoxLayout()
+        self.lanes_widget.setLayout(self.lanes_layout)
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setWidget(self.lanes_widget)
+        self.central_layout.addWidget(self.scroll_area, 1)
+
+        self.clock_label = QLabel("0.00 s")
+        self.central_layout.addWidget(self.clock_label)
+
+        for lane in DEFAULT_LANES:
+            self.add_lane(*lane)
+        self.resize(900, 700)
+
+    def add_lane(self, algorithm: str, pivot: str, partition: str):
+        lane = RaceLane(self, algorithm, pivot, partition)
+        self.lanes.append(lane)
+        self.lanes_layout.addWidget(lane, 1)
+
+    def remove_lane(self, lane: RaceLane):
+        if len(self.lanes) <= 1:
+            return
+        self.lanes.remove(lane)
+        self.lanes_layout.removeWidget(lane)
+        lane.deleteLater()
+
+    def set_input(self, number_of_elements: int, distribution: str, seed: int):
+        # Follows the input of the main window, unless a race is running
+        if self.running or (number_of_elements, distribution, seed) == self.input_settings:
+            return
+        self.array_size_spinbox.setValue(number_of_elements)
+        self.input_combobox.setCurrentText(distribution)
+        self.input_seed_spinbox.setValue(seed)
+        self.create_input()
+
+    def create_input(self):
+        self.input_settings = (
+            self.array_size_spinbox.value(),
+            self.input_combobox.currentText(),
+            self.input_seed_spinbox.value(),
+        )
+        number_of_elements, distribution, seed = self.input_settings
+        self.values = generate_input(distribution, number_of_elements, seed)
+        for lane in self.lanes:
+            lane.reset(self.values)
+
+    def start_stop(self):
+        if not self.running:
+            self.running = True
+            self.clock = 0.0
+            self.step_credit = 0.0
+            self.finished_lanes = 0
+            for lane in self.lanes:
+                lane.start(self.values)
+                lane.set_running(True)
+            for widget in (self.create_input_button, self.add_lane_button):
+                widget.setDisabled(True)
+            self.start_button.setText("Stop")
+            self.pause_button.setEnabled(True)
+            self.resume()
+        else:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        self.frame_timer.stop()
+        for lane in self.lanes:
+            lane.set_running(False)
+        for widget in (self.create_input_button, self.add_lane_button):
+            widget.setEnabled(True)
+        self.start_button.setText("Start")
+        self.pause_button.setText("Pause")
+        self.pause_button.setDisabled(True)
+
+    def pause_resume(self):
+        if self.frame_timer.isActive():
+            self.frame_timer.stop()
+            self.pause_button.setText("Resume")
+        else:
+            self.resume()
+
+    def resume(self):
+        self.last_frame = perf_counter()
+        self.frame_timer.start()
+        self.pause_button.setText("Pause")
+
+    def play_frame(self):
+        now = perf_counter()
+        elapsed = now - self.last_frame
+        self.clock += elapsed
+        self.last_frame = now
+        speed = self.speed_spinbox.value()
+
+        # Every lane gets the same chunk, resized to keep the frame in budget
+        if speed == 0:
+            count = self.max_speed_chunk
+        else:
+            self.step_credit += elapsed * speed
+            count = int(self.step_credit)
+            self.step_credit -= count
+            if count > self.max_speed_chunk:
+                # Steps that do not fit in the frame are dropped, so a slow
+                # frame does not make the next one even longer
+                count = self.max_speed_chunk
+                self.step_credit = 0.0
+
+        finished = []
+        for lane in self.lanes:
+            if not lane.finished:
+                lane.advance(count, self.clock)
+                if lane.finished:
+                    finished.append(lane)
+
+        # Lanes finishing in the same frame are ranked by their step count
+        for lane in sorted(finished, key=lambda lane: lane.state.position):
+            self.finished_lanes += 1
+            lane.place = self.finished_lanes
+            lane.show_status()
+
+        spent = perf_counter() - now
+        if spent > self.FRAME_BUDGET and self.max_speed_chunk > 1:
+            self.max_speed_chunk //= 2
+        elif spent < self.FRAME_BUDGET / 2 and count >= self.max_speed_chunk:
+            self.max_speed_chunk *= 2
+
+        self.clock_label.setText(f"{self.clock:.2f} s")
+        if self.finished_lanes == len(self.lanes):
+            self.stop()
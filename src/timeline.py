@@ -0,0 +1,279 @@
+from array import array
+from bisect import bisect_right, insort
+
+from .trace import BackgroundTrace, Op, StepStream, Trace
+
+
+class SortState:
+    # Array and marker positions after `position` steps. Steps are applied
+    # in place, so a view sharing `values` always shows the current state.
+    def __init__(self, values: array):
+        self.values = values
+        self.pivot = None
+        self.green = None
+        self.red = None
+        self.blue = None
+        self.start = 0
+        self.end = len(values) - 1
+        self.position = 0
+        self.comparisons = 0
+        self.swaps = 0
+        # Ranges of the partitions enclosing the current one
+        self.ranges = []
+        self.max_depth = 0
+        # Steps spent in each phase of hybrid sorts, see enter_phase()
+        self.phase = None
+        self.phase_start = 0
+        self.phase_totals = {}
+
+    def apply(self, op: int, a: int, b: int, c: int, d: int) -> tuple:
+        # Returns the indices whose values changed
+        self.position += 1
+        match op:
+            case Op.PIVOT:
+                self.pivot = a
+                self.start, self.end = c, d
+                self.enter_range(c, d)
+                if self.phase != "partition":
+                    self.enter_phase("partition")
+            case Op.PICK_GREEN_RED:
+                self.green, self.red = a, c
+            case Op.GREEN_LESS_EQ_PIVOT | Op.GREEN_GREATER_PIVOT:
+                self.comparisons += 1
+            case Op.SWAP_GREEN_RED:
+                v, green, red = self.values, self.green, self.red
+                v[green], v[red] = v[red], v[green]
+                self.swaps += 1
+                return green, red
+            case Op.SWAP_PIVOT_RED:
+                v, red = self.values, self.red
+                v[a], v[red] = v[red], v[a]
+                self.swaps += 1
+                return a, red
+            case Op.DECREASE_GREEN:
+                self.green -= 1
+            case Op.DECREASE_RED:
+                self.red -= 1
+            case Op.SWAP_PIVOT_START:
+                v = self.values
+                v[a], v[c] = v[c], v[a]
+                self.pivot = c
+                self.swaps += 1
+                return a, c
+            case Op.MOVE_GREEN:
+                self.green = a
+            case Op.MOVE_RED:
+                self.red = a
+            case Op.MOVE_BLUE:
+                self.blue = a
+            case Op.COMPARE:
+                self.comparisons += 1
+            case Op.SWAP:
+                v = self.values
+                v[a], v[c] = v[c], v[a]
+                # The pivot marker follows the pivot value
+                if self.pivot == a:
+                    self.pivot = c
+                elif self.pivot == c:
+                    self.pivot = a
+                self.swaps += 1
+                return a, c
+            case Op.INSERTION_RANGE | Op.HEAPSORT_RANGE:
+                self.pivot = self.green = self.red = self.blue = None
+                self.start, self.end = a, b
+                self.enter_range(a, b)
+                self.enter_phase("insertion" if op == Op.INSERTION_RANGE else "heapsort")
+            case Op.INSERT:
+                # The element at a moves to c and the ones between shift right
+                v = self.values
+                v[c + 1:a + 1] = v[c:a]
+                v[c] = b
+                self.green = c
+                self.swaps += 1
+                return range(c, a + 1)
+        return ()
+
+    def enter_range(self, start: int, end: int):
+        ranges = self.ranges
+        while ranges and not (ranges[-1][0] <= start and end <= ranges[-1][1]):
+            ranges.pop()
+        ranges.append((start, end))
+        self.max_depth = max(self.max_depth, len(ranges))
+
+    def enter_phase(self, phase: str):
+        # The step being applied is the first one of the new phase
+        if self.phase is not None:
+            self.phase_totals[self.phase] = (
+                self.phase_totals.get(self.phase, 0) + self.position - 1 - self.phase_start
+            )
+        self.phase = phase
+        self.phase_start = self.position - 1
+
+    def phase_steps(self) -> dict:
+        steps = dict(self.phase_totals)
+        if self.phase is not None:
+            steps[self.phase] = steps.get(self.phase, 0) + self.position - self.phase_start
+        return steps
+
+    @property
+    def depth(self) -> int:
+        return len(self.ranges)
+
+    def snapshot(self) -> tuple:
+        return (
+            array("i", self.values),
+            self.pivot,
+            self.green,
+            self.red,
+            self.blue,
+            self.start,
+            self.end,
+            self.position,
+            self.comparisons,
+            self.swaps,
+            list(self.ranges),
+            self.max_depth,
+            self.phase,
+            self.phase_start,
+            dict(self.phase_totals),
+        )
+
+    def restore(self, snapshot: tuple):
+        (
+            values,
+            self.pivot,
+            self.green,
+            self.red,
+            self.blue,
+            self.start,
+            self.end,
+            self.position,
+            self.comparisons,
+            self.swaps,
+            ranges,
+            self.max_depth,
+            self.phase,
+            self.phase_start,
+            phase_totals,
+        ) = snapshot
+        self.values[:] = values
+        self.ranges = list(ranges)
+        self.phase_totals = dict(phase_totals)
+
+
+class Timeline:
+    # Plays a trace forward on a SortState and keeps a snapshot every
+    # `interval` steps, so any step can be reached by restoring the closest
+    # earlier snapshot and replaying at most `interval` steps. When the
+    # snapshots outgrow `memory_limit` bytes the interval is doubled and
+    # every other snapshot is dropped.
+    def __init__(
+        self,
+        trace: Trace | StepStream,
+        state: SortState,
+        interval: int = 1000,
+        memory_limit: int = 64 * 2**20,
+    ):
+        self.trace = trace
+        self.state = state
+        self.interval = interval
+        self.memory_limit = memory_limit
+        self.seekable = isinstance(trace, Trace)
+        self.snapshots = {}
+        self.positions = []
+        self.record()
+
+    def __len__(self):
+        return len(self.trace) if self.seekable else self.state.position
+
+    @property
+    def snapshot_size(self) -> int:
+        return self.state.values.itemsize * len(self.state.values) + 64
+
+    @property
+    def memory_used(self) -> int:
+        return len(self.snapshots) * self.snapshot_size
+
+    def record(self):
+        position = self.state.position
+        if position in self.snapshots:
+            return
+        self.snapshots[position] = self.state.snapshot()
+        insort(self.positions, position)
+
+        while self.memory_used > self.memory_limit and len(self.snapshots) > 1:
+            self.interval *= 2
+            self.positions = [p for p in self.positions if p % self.interval == 0]
+            self.snapshots = {p: self.snapshots[p] for p in self.positions}
+
+    def step(self) -> tuple:
+        step = self.trace.next()
+        if step is None:
+            return None, ()
+        dirty = self.state.apply(*step)
+        if self.seekable and self.state.position % self.interval == 0:
+            self.record()
+        return step, dirty
+
+    def fast_forward(self, stop=None, limit: int | None = None) -> int:
+        # Applies steps in a tight loop, without returning them, until
+        # stop(state) is true after a step, `limit` steps have been applied
+        # or the trace ends. Returns the number of steps applied.
+        if not isinstance(self.trace, Trace):
+            return self.forward_stream(stop, limit)
+
+        trace, state = self.trace, self.state
+        apply = state.apply
+        fields = Trace.FIELDS
+        applied = 0
+        while limit is None or applied < limit:
+            if trace.cursor >= len(trace.ops):
+                # Background traces grow while playing
+                if not isinstance(trace, BackgroundTrace) or not trace.receive():
+                    break
+            ops, args = trace.ops, trace.args
+            start = trace.cursor
+            end = len(ops) if limit is None else min(len(ops), start + limit - applied)
+            for i in range(start, end):
+                j = i * fields
+                apply(ops[i], args[j], args[j + 1], args[j + 2], args[j + 3])
+                if state.position % self.interval == 0:
+                    self.record()
+                if stop is not None:
+                    # The condition may look at the trace, so it has to be
+                    # in sync
+                    trace.cursor = i + 1
+                    if stop(state):
+                        return applied + i + 1 - start
+            trace.cursor = end
+            applied += end - start
+        return applied
+
+    def forward_stream(self, stop, limit: int | None) -> int:
+        applied = 0
+        while limit is None or applied < limit:
+            step = self.trace.next()
+            if step is None:
+                break
+            self.state.apply(*step)
+            applied += 1
+            if stop is not None and stop(self.state):
+                break
+        return applied
+
+    def seek(self, index: int):
+        if not self.seekable:
+            raise ValueError("Streamed traces can only be played forward")
+
+        if isinstance(self.trace, BackgroundTrace):
+            # Steps past the ones received so far have to be generated first
+            while len(self.trace) < index and self.trace.receive():
+                pass
+        index = min(max(index, 0), len(self.trace))
+        position = self.state.position
+        nearest = self.positions[bisect_right(self.positions, index) - 1]
+        if index < position or nearest > position:
+            self.state.restore(self.snapshots[nearest])
+
+        self.trace.cursor = self.state.position
+        self.fast_forward(limit=index - self.state.position)
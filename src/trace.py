@@ -0,0 +1,372 @@
+from array import array
+from dataclasses import dataclass
+from enum import IntEnum
+from itertools import islice
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from typing import Iterable, Iterator
+
+
+class Op(IntEnum):
+    PIVOT = 0
+    PICK_GREEN_RED = 1
+    GREEN_LESS_EQ_PIVOT = 2
+    GREEN_GREATER_PIVOT = 3
+    SWAP_GREEN_RED = 4
+    SWAP_PIVOT_RED = 5
+    DECREASE_GREEN = 6
+    DECREASE_RED = 7
+    SWAP_PIVOT_START = 8
+    MOVE_GREEN = 9
+    MOVE_RED = 10
+    MOVE_BLUE = 11
+    COMPARE = 12
+    SWAP = 13
+    INSERTION_RANGE = 14
+    HEAPSORT_RANGE = 15
+    INSERT = 16
+
+
+@dataclass
+class Pivot:
+    index: int
+    value: int
+    start: int
+    end: int
+
+
+@dataclass
+class PickGreenRed:
+    green_index: int
+    green_value: int
+    red_index: int
+    red_value: int
+
+
+@dataclass
+class GreenLessEqPivot:
+    green_index: int
+    green_value: int
+    pivot_index: int
+    pivot_value: int
+
+
+@dataclass
+class GreenGreaterPivot:
+    green_index: int
+    green_value: int
+    pivot_index: int
+    pivot_value: int
+
+
+@dataclass
+class SwapGreenRed:
+    green_index: int
+    green_value: int
+    red_index: int
+    red_value: int
+
+
+@dataclass
+class SwapPivotRed:
+    pivot_index: int
+    pivot_value: int
+    red_index: int
+    red_value: int
+
+
+@dataclass
+class SwapPivotStart:
+    pivot_index: int
+    pivot_value: int
+    start_index: int
+    start_value: int
+
+
+@dataclass
+class MoveGreen:
+    index: int
+    value: int
+
+
+@dataclass
+class MoveRed:
+    index: int
+    value: int
+
+
+@dataclass
+class MoveBlue:
+    index: int
+    value: int
+
+
+@dataclass
+class Compare:
+    index: int
+    value: int
+    pivot_value: int
+    result: int
+
+
+@dataclass
+class Swap:
+    first_index: int
+    first_value: int
+    second_index: int
+    second_value: int
+
+
+@dataclass
+class InsertionRange:
+    start: int
+    end: int
+
+
+@dataclass
+class HeapsortRange:
+    start: int
+    end: int
+
+
+@dataclass
+class Insert:
+    from_index: int
+    value: int
+    to_index: int
+    displaced_value: int
+
+
+@dataclass
+class DecreaseGreen:
+    pass
+
+
+@dataclass
+class DecreaseRed:
+    pass
+
+
+STEP_CLASSES = {
+    Op.PIVOT: Pivot,
+    Op.PICK_GREEN_RED: PickGreenRed,
+    Op.GREEN_LESS_EQ_PIVOT: GreenLessEqPivot,
+    Op.GREEN_GREATER_PIVOT: GreenGreaterPivot,
+    Op.SWAP_GREEN_RED: SwapGreenRed,
+    Op.SWAP_PIVOT_RED: SwapPivotRed,
+    Op.DECREASE_GREEN: DecreaseGreen,
+    Op.DECREASE_RED: DecreaseRed,
+    Op.SWAP_PIVOT_START: SwapPivotStart,
+    Op.MOVE_GREEN: MoveGreen,
+    Op.MOVE_RED: MoveRed,
+    Op.MOVE_BLUE: MoveBlue,
+    Op.COMPARE: Compare,
+    Op.SWAP: Swap,
+    Op.INSERTION_RANGE: InsertionRange,
+    Op.HEAPSORT_RANGE: HeapsortRange,
+    Op.INSERT: Insert,
+}
+
+
+def describe(op: int, a: int, b: int, c: int, d: int) -> str:
+    match op:
+        case Op.PIVOT:
+            return f"Pivot: {b}"
+        case Op.PICK_GREEN_RED:
+            return f"Green: {b} Red: {d}"
+        case Op.GREEN_LESS_EQ_PIVOT:
+            return f"Green {b} <= {d}"
+        case Op.GREEN_GREATER_PIVOT:
+            return f"Green > pivot: {b} > {d}"
+        case Op.SWAP_GREEN_RED:
+            return f"Swapping green <-> red: {b} <-> {d}"
+        case Op.SWAP_PIVOT_RED:
+            return f"Swapping pivot <-> red: {b} <-> {d}"
+        case Op.DECREASE_GREEN:
+            return "Decrease green marker"
+        case Op.DECREASE_RED:
+            return "Decrease red marker"
+        case Op.SWAP_PIVOT_START:
+            return f"Moving pivot to the start: {b} <-> {d}"
+        case Op.MOVE_GREEN:
+            return f"Green: {b}"
+        case Op.MOVE_RED:
+            return f"Red: {b}"
+        case Op.MOVE_BLUE:
+            return f"Blue: {b}"
+        case Op.COMPARE:
+            return f"{b} {'<=>'[d + 1]} {c}"
+        case Op.SWAP:
+            return f"Swapping {b} <-> {d}"
+        case Op.INSERTION_RANGE:
+            return f"Insertion sort on {b - a + 1} elements"
+        case Op.HEAPSORT_RANGE:
+            return f"Too deep, heapsort on {b - a + 1} elements"
+        case Op.INSERT:
+            return f"Inserting {b} before {d}"
+
+
+class Trace:
+    # Every step is stored as one opcode plus FIELDS integers, so a trace costs
+    # 1 + 4 * FIELDS bytes per step instead of one Python object per step.
+    FIELDS = 4
+    # Whether every step of the sort is stored
+    complete = True
+
+    def __init__(self):
+        self.ops = array("B")
+        self.args = array("i")
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.ops)
+
+    def append(self, op: int, a: int = 0, b: int = 0, c: int = 0, d: int = 0):
+        self.ops.append(op)
+        self.args.extend((a, b, c, d))
+
+    def extend(self, steps: Iterable[tuple]):
+        ops, args = self.ops, self.args
+        for op, a, b, c, d in steps:
+            ops.append(op)
+            args.extend((a, b, c, d))
+
+    def clear(self):
+        self.ops = array("B")
+        self.args = array("i")
+        self.cursor = 0
+
+    def read(self, index: int) -> tuple:
+        i = index * self.FIELDS
+        return self.ops[index], *self.args[i:i + self.FIELDS]
+
+    def step(self, index: int):
+        # Decoded, human readable view of a single step, useful for debugging
+        op, *fields = self.read(index)
+        step_class = STEP_CLASSES[op]
+        return step_class(*fields[:len(step_class.__dataclass_fields__)])
+
+    def next(self) -> tuple | None:
+        if self.cursor >= len(self.ops):
+            return None
+        step = self.read(self.cursor)
+        self.cursor += 1
+        return step
+
+    def peek(self) -> tuple | None:
+        if self.cursor >= len(self.ops):
+            return None
+        return self.read(self.cursor)
+
+    def rewind(self):
+        self.cursor = 0
+
+    @property
+    def remaining(self) -> int:
+        return len(self.ops) - self.cursor
+
+
+class StepStream:
+    # Pulls steps lazily from a generator, keeping at most `lookahead` of them
+    # in memory. Exposes the same next() interface as Trace.
+    def __init__(self, steps: Iterator[tuple], lookahead: int = 4096):
+        self.steps = steps
+        self.lookahead = lookahead
+        self.buffer = Trace()
+        self.exhausted = False
+
+    def fill(self):
+        self.buffer.clear()
+        self.buffer.extend(islice(self.steps, self.lookahead))
+        if not len(self.buffer):
+            self.exhausted = True
+
+    def next(self) -> tuple | None:
+        if not self.buffer.remaining:
+            if self.exhausted:
+                return None
+            self.fill()
+        return self.buffer.next()
+
+    def peek(self) -> tuple | None:
+        if not self.buffer.remaining:
+            if self.exhausted:
+                return None
+            self.fill()
+        return self.buffer.peek()
+
+
+class BackgroundTrace(Trace):
+    # Trace generated by a worker thread. The worker packs steps in chunks and
+    # hands them over through a bounded queue, so it blocks once `max_chunks`
+    # chunks are waiting and never runs further than that ahead of playback.
+    # Chunks are appended to the trace when playback reaches its end.
+    def __init__(self, steps: Iterator[tuple], chunk_size: int = 4096, max_chunks: int = 16):
+        Trace.__init__(self)
+        self.chunk_size = chunk_size
+        self.queue = Queue(max_chunks)
+        self.cancelled = Event()
+        self.complete = False
+        self.error = None
+        self.worker = Thread(target=self.produce, args=(steps,), daemon=True)
+        self.worker.start()
+
+    def produce(self, steps: Iterator[tuple]):
+        try:
+            while not self.cancelled.is_set():
+                chunk = Trace()
+                chunk.extend(islice(steps, self.chunk_size))
+                if not len(chunk):
+                    break
+                self.put((chunk.ops, chunk.args))
+        except Exception as error:
+            self.error = error
+        finally:
+            self.put(None)
+
+    def put(self, item):
+        # Blocks while the queue is full, unless the trace is cancelled
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def receive(self, block: bool = True) -> bool:
+        # Appends the next chunk, returns False when there is none left
+        if self.complete or self.cancelled.is_set():
+            return False
+        try:
+            item = self.queue.get(block)
+        except Empty:
+            return False
+        if item is None:
+            self.complete = True
+            if self.error is not None:
+                raise self.error
+            return False
+        ops, args = item
+        self.ops.extend(ops)
+        self.args.extend(args)
+        return True
+
+    def next(self) -> tuple | None:
+        if self.cursor >= len(self.ops) and not self.receive():
+            return None
+        return Trace.next(self)
+
+    def peek(self) -> tuple | None:
+        if self.cursor >= len(self.ops) and not self.receive():
+            return None
+        return Trace.peek(self)
+
+    def cancel(self):
+        # Stops the worker right away. Draining the queue wakes it up if it
+        # is waiting for room.
+        self.cancelled.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                break
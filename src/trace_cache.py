@@ -0,0 +1,67 @@
+import hashlib
+import json
+from array import array
+from collections import OrderedDict
+
+from .trace import Trace
+
+
+def trace_key(values: array, settings: dict) -> str:
+    # The same input and settings always generate the same trace
+    digest = hashlib.blake2b(array("i", values).tobytes(), digest_size=16)
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def trace_size(trace: Trace) -> int:
+    return len(trace.ops) * trace.ops.itemsize + len(trace.args) * trace.args.itemsize
+
+
+class TraceCache:
+    # Complete traces by trace_key, least recently used first. Once they
+    # take more than `memory_limit` bytes the oldest ones are dropped.
+    def __init__(self, memory_limit: int = 256 * 2**20):
+        self.memory_limit = memory_limit
+        self.traces = OrderedDict()
+        self.memory_used = 0
+
+    def __len__(self):
+        return len(self.traces)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.traces
+
+    def get(self, key: str) -> Trace | None:
+        # Returns a new trace over the cached steps, with its own cursor
+        cached = self.traces.get(key)
+        if cached is None:
+            return None
+        self.traces.move_to_end(key)
+        trace = Trace()
+        trace.ops, trace.args = cached.ops, cached.args
+        return trace
+
+    def put(self, key: str, trace: Trace):
+        if not trace.complete or key in self.traces:
+            return
+        size = trace_size(trace)
+        if size > self.memory_limit:
+            return
+        cached = Trace()
+        cached.ops, cached.args = trace.ops, trace.args
+        self.traces[key] = cached
+        self.memory_used += size
+        self.evict()
+
+    def evict(self):
+        while self.memory_used > self.memory_limit:
+            _, trace = self.traces.popitem(last=False)
+            self.memory_used -= trace_size(trace)
+
+    def set_memory_limit(self, memory_limit: int):
+        self.memory_limit = memory_limit
+        self.evict()
+
+    def clear(self):
+        self.traces.clear()
+        self.memory_used = 0
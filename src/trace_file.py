@@ -0,0 +1,119 @@
+# Binary trace files. Layout, little endian:
+#
+#   header    magic, version, byte order of the writer, metadata length,
+#             number of elements, number of steps
+#   metadata  JSON with the settings that generated the trace
+#   values    input array, one int32 per element
+#   args      Trace.FIELDS int32 per step
+#   ops       one byte per step
+#
+# Every section starts on an 8 byte boundary, so the values and the steps
+# can be used in place through a memory map.
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from .trace import Trace
+
+MAGIC = b"QQTRACE\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIIQ")
+LITTLE_ENDIAN, BIG_ENDIAN = 0, 1
+NATIVE = LITTLE_ENDIAN if sys.byteorder == "little" else BIG_ENDIAN
+
+
+def padding(size: int) -> int:
+    return -size % 8
+
+
+class MappedTrace(Trace):
+    # Read-only trace whose steps stay in the file. Pages are only read when
+    # playback gets to them, so opening a trace of any size is instant.
+    def __init__(self, ops, args):
+        Trace.__init__(self)
+        self.ops = ops
+        self.args = args
+        self.file = None
+        self.map = None
+
+    def close(self):
+        # Views on the map have to be released before it can be closed
+        if self.map is None:
+            return
+        for view in (self.ops, self.args):
+            if isinstance(view, memoryview):
+                view.release()
+        self.map.close()
+        self.file.close()
+        self.map = None
+
+
+def save_trace(path: str, values, trace: Trace, metadata: dict):
+    metadata = json.dumps(metadata).encode()
+    values = array("i", values)
+    args = array("i", trace.args)
+    if NATIVE == BIG_ENDIAN:
+        values.byteswap()
+        args.byteswap()
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, LITTLE_ENDIAN, len(metadata), len(values), len(trace)))
+        for section in (metadata, values.tobytes(), args.tobytes()):
+            f.write(section)
+            f.write(bytes(padding(len(section))))
+        f.write(bytes(trace.ops))
+
+
+def open_trace(path: str) -> tuple:
+    # Returns the input values, the metadata and a MappedTrace
+    f = open(path, "rb")
+    try:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a trace file")
+        _, version, byte_order, metadata_size, size, steps = HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"Unsupported trace file version {version}")
+
+        metadata = json.loads(f.read(metadata_size))
+        values_offset = HEADER.size + metadata_size + padding(metadata_size)
+        args_offset = values_offset + 4 * size + padding(4 * size)
+        ops_offset = args_offset + 4 * Trace.FIELDS * steps
+        f.seek(0, 2)
+        if f.tell() < ops_offset + steps:
+            raise ValueError(f"{path} is truncated")
+
+        values = array("i")
+        f.seek(values_offset)
+        values.fromfile(f, size)
+
+        if byte_order != NATIVE:
+            # Foreign byte order: the steps have to be converted in memory
+            values.byteswap()
+            args = array("i")
+            args.fromfile(f, Trace.FIELDS * steps)
+            args.byteswap()
+            ops = array("B")
+            ops.fromfile(f, steps)
+            trace = MappedTrace(ops, args)
+            f.close()
+            return values, metadata, trace
+
+        if not steps:
+            f.close()
+            return values, metadata, MappedTrace(array("B"), array("i"))
+
+        file_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(file_map)
+        trace = MappedTrace(
+            view[ops_offset:ops_offset + steps],
+            view[args_offset:ops_offset].cast("i"),
+        )
+        view.release()
+        trace.file, trace.map = f, file_map
+        return values, metadata, trace
+    except BaseException:
+        f.close()
+        raise
@@ -1,265 +1,592 @@
-from dataclasses import dataclass
+from array import array
+from bisect import bisect_right
+from time import perf_counter
 
-from PySide6.QtCore import QRect, QSize, Qt, QTimer
-from PySide6.QtGui import QPainter, QColor
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QRect, Qt, QTimer, Signal
+from PySide6.QtGui import QBrush, QPainter, QPixmap, QRegion, QColor, QKeySequence
 from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QApplication,
+    QFileDialog,
+    QFormLayout,
     QLabel,
+    QListView,
+    QPushButton,
     QSizePolicy,
-    QScrollArea,
+    QVBoxLayout,
+    QWidget,
 )
 
+from .inputs import check_values
+from .metrics import Metrics
+
 
 class RangeMarker(QLabel):
-    def __init__(self, layout_width: int, num_elements: int, start: int, end: int):
+    # Black bar under the columns of the range being partitioned
+    def __init__(self, canvas, start: int, end: int):
         QLabel.__init__(self)
-        self.layout_width = layout_width
-        self.num_elements = num_elements
+        self.canvas = canvas
         self.start = start
         self.end = end
+        canvas.columns_changed.connect(self.update)
 
     def paintEvent(self, event):
         QLabel.paintEvent(self, event)
+        if not 0 <= self.start <= self.end < len(self.canvas.values):
+            return
         qp = QPainter(self)
-
-        offset_width = self.layout_width // self.num_elements * self.start
-        width = self.layout_width / self.num_elements * (self.end - self.start + 1)
-
-        qp.fillRect(QRect(offset_width, 0, int(width), self.height()), QColor(0, 0, 0))
-
-
-class Element(QLabel):
-    def __init__(
-        self,
-        quicksort_widget,
-        value: int,
-        number_of_elements: int,
-        parent_height: int,
-        parent_width: int,
-    ):
-
-        QLabel.__init__(self)
-        self.quicksort_widget = quicksort_widget
-        self.value = value
-        self.position = value - 1  # This is true when the widgets are sorted
-        self.number_of_elements = number_of_elements
-        self.parent_height = parent_height
-        self.parent_width = parent_width
-        # self.setText(f"{self.value}")
-        self.setAlignment(Qt.AlignCenter | Qt.AlignBottom)
-
-    def update_position(self, position: int):
-        self.position = position
-        self.setText(f"{self.position} - {self.value}")
-
-    def widget_width(self):
-        return int(self.parent_width / self.number_of_elements)
-
-    def widget_height(self):
-        return int(self.parent_height / self.number_of_elements * self.value)
-
-    def sizeHint(self) -> QSize:
-        return QSize(self.widget_width(), self.widget_height())
+        left = self.canvas.column_left(self.start)
+        right = self.canvas.column_rect(self.end).right()
+        qp.fillRect(QRect(left, 0, right - left + 1, self.height()), QColor(0, 0, 0))
+
+
+# From https://stackoverflow.com/a/3407960/11760835
+def spectral_color(w):
+    if 380 <= w < 440:
+        R = -(w - 440.0) / (440.0 - 380.0)
+        G = 0.0
+        B = 1.0
+    elif 440 <= w < 490:
+        R = 0.0
+        G = (w - 440.0) / (490.0 - 440.0)
+        B = 1.0
+    elif 490 <= w < 510:
+        R = 0.0
+        G = 1.0
+        B = -(w - 510.0) / (510.0 - 490.0)
+    elif 510 <= w < 580:
+        R = (w - 510.0) / (580.0 - 510.0)
+        G = 1.0
+        B = 0.0
+    elif 580 <= w < 645:
+        R = 1.0
+        G = -(w - 645.0) / (645.0 - 580.0)
+        B = 0.0
+    elif 645 <= w <= 780:
+        R = 1.0
+        G = 0.0
+        B = 0.0
+    else:
+        R = 0.0
+        G = 0.0
+        B = 0.0
+
+    return R * 255, G * 255, B * 255
+
+
+class BarCanvas(QWidget):
+    # Draws every bar of the array on a single widget. Values live in a flat
+    # array, and changing one of them only repaints the column it occupies.
+    # Bars are drawn into a pixmap that is kept between paints. While the
+    # widget is being resized the pixmap is stretched instead, and the bars
+    # are laid out again once the size has settled.
+    #
+    # With more values than pixels the canvas switches to an overview: every
+    # pixel column is a bucket of values drawn as its min, mean and max, so
+    # painting costs the same for any N. Bucket stats are cached and only the
+    # buckets touched by a step are reduced again.
+    RESIZE_DELAY = 100  # ms without resize events before relayout
+    COLOR_LEVELS = 1024
+    color_table = []
+    # Lighter versions of the colors for the part of a bucket between its
+    # mean and its min and max
+    spread_tables = ([], [])
+
+    columns_changed = Signal()
+
+    def __init__(self, values):
+        QWidget.__init__(self)
+        self.values = array("i", values)
+        self.show_values = True
+        self.metrics = None
+        self.brushes = []
+        self.labels = []
+        self.build_tables()
+        # Left edge of every column, plus the right edge of the last one
+        self.edges = array("i")
+        self.overview = False
+        # First index of every bucket, plus the end of the last one
+        self.bounds = array("i")
+        self.bucket_min = array("i")
+        self.bucket_max = array("i")
+        self.bucket_mean = array("i")
+        self.dirty_buckets = set()
+        self.layout_columns()
+        self.frame = None
+        self.resizing = False
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(self.RESIZE_DELAY)
+        self.resize_timer.timeout.connect(self.finish_resize)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumHeight(60)
+
+    def build_tables(self):
+        # Colors come from a fixed table indexed by value / n, so it is built
+        # once for every size. Labels do not depend on n and the list only
+        # grows or shrinks by the difference.
+        if not BarCanvas.color_table:
+            BarCanvas.color_table = [
+                QBrush(QColor(*spectral_color(400 + 250 * level / (self.COLOR_LEVELS - 1))))
+                for level in range(self.COLOR_LEVELS)
+            ]
+            for table, alpha in zip(BarCanvas.spread_tables, (160, 64)):
+                for brush in BarCanvas.color_table:
+                    color = QColor(brush.color())
+                    color.setAlpha(alpha)
+                    table.append(QBrush(color))
+        n = len(self.values)
+        levels = self.COLOR_LEVELS - 1
+        self.brushes = [self.color_table[levels * value // n] for value in range(n + 1)]
+
+        if len(self.labels) <= n:
+            self.labels.extend(f"{value}" for value in range(len(self.labels), n + 1))
+        else:
+            del self.labels[n + 1:]
+
+    def layout_columns(self):
+        width, n = self.width(), len(self.values)
+        self.edges = array("i", (width * i // n for i in range(n + 1)))
+        self.overview = n > width > 0
+        if self.overview:
+            # Bucket x holds the indices whose column starts at pixel x
+            self.bounds = array("i", (-(-x * n // width) for x in range(width + 1)))
+            empty = bytes(4 * width)
+            self.bucket_min = array("i", empty)
+            self.bucket_max = array("i", empty)
+            self.bucket_mean = array("i", empty)
+            self.dirty_buckets = set(range(width))
+
+    def update_buckets(self):
+        # Each bucket is a slice reduced by min, max and sum in C, so the
+        # Python loop runs once per pixel column and not once per value
+        values, bounds = self.values, self.bounds
+        for x in self.dirty_buckets:
+            bucket = values[bounds[x]:bounds[x + 1]]
+            self.bucket_min[x] = min(bucket)
+            self.bucket_max[x] = max(bucket)
+            self.bucket_mean[x] = sum(bucket) // len(bucket)
+        self.dirty_buckets.clear()
+
+    def set_values(self, values):
+        # The array is updated in place, so views sharing it stay valid
+        resized = len(values) != len(self.values)
+        if not isinstance(values, array) or values.typecode != "i":
+            values = array("i", values)
+        check_values(values)
+        self.values[:] = values
+        if resized:
+            self.build_tables()
+            self.layout_columns()
+            self.columns_changed.emit()
+        self.update_all()
+
+    def set_show_values(self, show_values: bool):
+        if show_values != self.show_values:
+            self.show_values = show_values
+            self.update()
+
+    def column_left(self, index: int) -> int:
+        return self.edges[index]
+
+    def column_rect(self, index: int) -> QRect:
+        left = self.edges[index]
+        width = max(self.edges[index + 1] - left, 1)
+        return QRect(left, 0, width, self.height())
+
+    def column_at(self, x: int) -> int:
+        return min(max(bisect_right(self.edges, x) - 1, 0), len(self.values) - 1)
+
+    def update_columns(self, indices):
+        if self.resizing:
+            return
+        if self.overview:
+            edges = self.edges
+            touched = {edges[i] for i in indices} - self.dirty_buckets
+            self.dirty_buckets |= touched
+            height = self.height()
+            for x in touched:
+                self.update(QRect(x, 0, 1, height))
+            return
+        for i in indices:
+            self.update(self.column_rect(i))
+
+    def update_all(self):
+        # For changes to any number of values, like a seek
+        if self.overview:
+            self.dirty_buckets = set(range(len(self.bounds) - 1))
+        self.update()
+
+    def resizeEvent(self, event):
+        QWidget.resizeEvent(self, event)
+        if self.frame is None:
+            self.layout_columns()
+            return
+        self.resizing = True
+        self.resize_timer.start()
+
+    def finish_resize(self):
+        self.resizing = False
+        self.frame = None
+        self.layout_columns()
+        self.columns_changed.emit()
+        self.update()
 
     def paintEvent(self, event):
         qp = QPainter(self)
-
-        # From https://stackoverflow.com/a/3407960/11760835
-        def spectral_color(w):
-            if 380 <= w < 440:
-                R = -(w - 440.0) / (440.0 - 380.0)
-                G = 0.0
-                B = 1.0
-            elif 440 <= w < 490:
-                R = 0.0
-                G = (w - 440.0) / (490.0 - 440.0)
-                B = 1.0
-            elif 490 <= w < 510:
-                R = 0.0
-                G = 1.0
-                B = -(w - 510.0) / (510.0 - 490.0)
-            elif 510 <= w < 580:
-                R = (w - 510.0) / (580.0 - 510.0)
-                G = 1.0
-                B = 0.0
-            elif 580 <= w < 645:
-                R = 1.0
-                G = -(w - 645.0) / (645.0 - 580.0)
-                B = 0.0
-            elif 645 <= w <= 780:
-                R = 1.0
-                G = 0.0
-                B = 0.0
-            else:
-                R = 0.0
-                G = 0.0
-                B = 0.0
-
-            return R * 255, G * 255, B * 255
-
-        rgb = spectral_color(
-            400 + 250 * self.value / self.quicksort_widget.number_of_elements
-        )
-
-        qp.fillRect(QRect(0, 0, self.width(), self.height()), QColor(*rgb))
-        QLabel.paintEvent(self, event)
-        if self.parent().main_window.element_label_checkbox.isChecked():
-            self.setText(f"{self.value}")
-
-    def __repr__(self):
-        return f"E({self.position=}, {self.value=})"
-
-
-@dataclass
-class PivotMarker(QLabel):
-    def __init__(self, position):
-        QLabel.__init__(self)
-        self.position = position
-        self.setStyleSheet("background: yellow;")
-        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Fixed)
-
-
-class Marker(QLabel):
-    def __init__(self, color: str, position: int):
-        QLabel.__init__(self)
-        self.color = color
-        if color == "green":
-            self.setStyleSheet(f"background: rgb(0, 255, 0)")
-        elif color == "red":
-            self.setStyleSheet(f"background: rgb(255, 77, 77)")
+        if self.resizing and self.frame is not None:
+            qp.drawPixmap(self.rect(), self.frame)
+            return
+
+        paint_start = perf_counter()
+        ratio = self.devicePixelRatioF()
+        if self.frame is None or self.frame.deviceIndependentSize().toSize() != self.size():
+            self.frame = QPixmap(self.size() * ratio)
+            self.frame.setDevicePixelRatio(ratio)
+            self.layout_columns()
+            region = QRegion(self.rect())
         else:
-            raise Exception("Unknown color")
-        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Fixed)
-        self.position = position
-
-    def __repr__(self):
-        return f"Marker({self.color=}, {self.position=})"
-
-    # def __del__(self):
-    #     print(f"Se borró {self}")
-
-
-@dataclass
-class GreenMarkerPlaceholder(QLabel):
-    def __init__(self, position: int):
-        QLabel.__init__(self)
-        self.position = position
-        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Fixed)
-        self.setStyleSheet("background: rgb(230, 230, 230);")
-
-    def __repr__(self):
-        return f"GreenMarkerPlaceholder({self.position=})"
-
-    # def __del__(self):
-    #     print(f"Deleted {self}")
-
-
-@dataclass
-class RedMarkerPlaceholder(QLabel):
-    def __init__(self, position: int):
-        QLabel.__init__(self)
-        self.position = position
+            region = event.region()
+
+        painter = QPainter(self.frame)
+        background = self.palette().window()
+        # Each rectangle of the region is painted on its own, so two distant
+        # columns do not repaint everything between them
+        for rect in region:
+            painter.fillRect(rect, background)
+            self.paint_columns(painter, rect)
+        painter.end()
+        # The painter is clipped to the region, so only that part is copied
+        qp.drawPixmap(0, 0, self.frame)
+
+        if self.metrics:
+            self.metrics.record_paint(perf_counter() - paint_start)
+
+    def paint_columns(self, qp: QPainter, rect: QRect):
+        if self.overview:
+            self.paint_buckets(qp, rect)
+            return
+        n = len(self.values)
+        height = self.height()
+        brushes, labels = self.brushes, self.labels
+        font_metrics = qp.fontMetrics()
+
+        for i in range(self.column_at(rect.left()), self.column_at(rect.right()) + 1):
+            value = self.values[i]
+            column = self.column_rect(i)
+            bar_height = height * value // n
+            bar = QRect(column.left(), height - bar_height, column.width(), bar_height)
+            if column.width() > 3:
+                bar.setWidth(column.width() - 1)
+
+            qp.fillRect(bar, brushes[value])
+            if self.show_values:
+                text = labels[value]
+                if font_metrics.horizontalAdvance(text) <= bar.width():
+                    qp.drawText(bar, Qt.AlignHCenter | Qt.AlignBottom, text)
+
+
+    def paint_buckets(self, qp: QPainter, rect: QRect):
+        if self.dirty_buckets:
+            self.update_buckets()
+        n = len(self.values)
+        height = self.height()
+        levels = self.COLOR_LEVELS - 1
+        solid = self.color_table
+        inner, outer = self.spread_tables
+
+        # Solid up to the smallest value, then lighter up to the mean and
+        # lightest up to the largest one
+        for x in range(max(rect.left(), 0), min(rect.right(), len(self.bounds) - 2) + 1):
+            low = height * self.bucket_min[x] // n
+            mean = height * self.bucket_mean[x] // n
+            high = height * self.bucket_max[x] // n
+            level = levels * self.bucket_mean[x] // n
+            qp.fillRect(x, height - low, 1, low, solid[level])
+            qp.fillRect(x, height - mean, 1, mean - low, inner[level])
+            qp.fillRect(x, height - high, 1, high - mean, outer[level])
+
+
+class MarkerRow(QWidget):
+    # One row of marker cells aligned with the canvas columns. The marker is
+    # just an index, so moving it only repaints the old and the new cell.
+    BACKGROUND = QColor(230, 230, 230)
+
+    def __init__(self, canvas: BarCanvas, color: QColor):
+        QWidget.__init__(self)
+        self.canvas = canvas
+        self.color = color
+        self.position = None
+        canvas.columns_changed.connect(self.update)
+        self.setFixedHeight(14)
         self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Fixed)
-        self.setStyleSheet("background: rgb(230, 230, 230);")
-
-    def __repr__(self):
-        return f"RedMarkerPlaceholder({self.position=})"
-
-    # def __del__(self):
-    #     print(f"Deleted {self}")
 
+    def cell_rect(self, index: int) -> QRect:
+        column = self.canvas.column_rect(index)
+        return QRect(column.left(), 0, column.width(), self.height())
 
-@dataclass
-class PivotPlaceholder(QLabel):
-    def __init__(self, position: int):
-        QLabel.__init__(self)
+    def move_to(self, position: int | None):
+        if position == self.position:
+            return
+        for index in (self.position, position):
+            if index is not None:
+                self.update(self.cell_rect(index))
         self.position = position
-        self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Fixed)
-        self.setStyleSheet("background: rgb(230, 230, 230);")
-
-    def __repr__(self):
-        return f"PivotPlaceholder({self.position=})"
-
-
-@dataclass
-class Pivot:
-    index: int
-    value: int
-    start: int
-    end: int
-
-
-@dataclass
-class PickGreenRed:
-    green_index: int
-    green_value: int
-    red_index: int
-    red_value: int
-
-
-@dataclass
-class GreenLessEqPivot:
-    green_index: int
-    green_value: int
-    pivot_index: int
-    pivot_value: int
-
-
-@dataclass
-class GreenGreaterPivot:
-    green_index: int
-    green_value: int
-    pivot_index: int
-    pivot_value: int
 
+    def paintEvent(self, event):
+        qp = QPainter(self)
+        rect = event.rect()
+        first = self.canvas.column_at(rect.left())
+        last = self.canvas.column_at(rect.right())
+
+        if self.canvas.column_rect(first).width() > 3:
+            # Wide columns are drawn one by one to keep the gaps between bars
+            for i in range(first, last + 1):
+                cell = self.cell_rect(i)
+                cell.setWidth(cell.width() - 1)
+                qp.fillRect(cell, self.color if i == self.position else self.BACKGROUND)
+        else:
+            qp.fillRect(rect, self.BACKGROUND)
+            if self.position is not None and first <= self.position <= last:
+                qp.fillRect(self.cell_rect(self.position), self.color)
 
-@dataclass
-class SwapGreenRed:
-    green_index: int
-    green_value: int
-    red_index: int
-    red_value: int
 
+class RingBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.items = [None] * capacity
+        self.start = 0
+        self.count = 0
 
-@dataclass
-class SwapPivotRed:
-    pivot_index: int
-    pivot_value: int
-    red_index: int
-    red_value: int
+    def __len__(self):
+        return self.count
 
+    def __getitem__(self, index: int):
+        return self.items[(self.start + index) % self.capacity]
 
-@dataclass
-class DecreaseGreen:
-    pass
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
 
+    def append(self, item):
+        if self.count < self.capacity:
+            self.items[(self.start + self.count) % self.capacity] = item
+            self.count += 1
+        else:
+            self.items[self.start] = item
+            self.start = (self.start + 1) % self.capacity
+
+    def clear(self):
+        self.items = [None] * self.capacity
+        self.start = 0
+        self.count = 0
+
+    def resize(self, capacity: int):
+        kept = list(self)[-capacity:]
+        self.capacity = capacity
+        self.clear()
+        for item in kept:
+            self.append(item)
+
+
+class LogModel(QAbstractListModel):
+    def __init__(self, retention: int):
+        QAbstractListModel.__init__(self)
+        self.lines = RingBuffer(retention)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return None
+
+    def append_lines(self, lines: list):
+        lines = lines[-self.lines.capacity:]
+        overflow = len(self.lines) + len(lines) - self.lines.capacity
+        if overflow > 0:
+            # Rows dropped from the front of the ring
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            self.lines.start = (self.lines.start + overflow) % self.lines.capacity
+            self.lines.count -= overflow
+            self.endRemoveRows()
+
+        first = len(self.lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        for line in lines:
+            self.lines.append(line)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.lines.clear()
+        self.endResetModel()
+
+    def set_retention(self, retention: int):
+        self.beginResetModel()
+        self.lines.resize(retention)
+        self.endResetModel()
+
+
+class LogWidget(QListView):
+    # Only the last `retention` lines are kept and only the visible rows are
+    # rendered. Lines added during the same frame are appended in one batch.
+    FLUSH_INTERVAL = 16
+
+    def __init__(self, main_window, retention: int = 10000):
+        QListView.__init__(self)
+        self.main_window = main_window
+        self.log_model = LogModel(retention)
+        self.setModel(self.log_model)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+        self.pending = []
+        self.log_file = None
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush)
 
-@dataclass
-class DecreaseRed:
-    pass
+    def add_text(self, text: str):
+        self.pending.append(text)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines, self.pending = self.pending, []
+        if self.log_file:
+            self.log_file.write("\n".join(lines) + "\n")
+        self.log_model.append_lines(lines)
+        self.scrollToBottom()
+
+    def clear(self):
+        if self.log_file:
+            self.flush()
+        self.pending = []
+        self.log_model.clear()
+
+    def set_retention(self, retention: int):
+        self.flush()
+        self.log_model.set_retention(retention)
+
+    def open_log_file(self, path: str):
+        self.close_log_file()
+        self.log_file = open(path, "w")
+
+    def close_log_file(self):
+        if self.log_file:
+            self.flush()
+            self.log_file.close()
+            self.log_file = None
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            QApplication.clipboard().setText("\n".join(self.log_model.lines[row] for row in rows))
+        else:
+            QListView.keyPressEvent(self, event)
 
 
-class ScrollAreaBottom(QScrollArea):
-    def __init__(self):
-        QScrollArea.__init__(self)
-        self.setWidgetResizable(True)
+class HistogramWidget(QWidget):
+    def __init__(self, title: str):
+        QWidget.__init__(self)
+        self.title = title
+        self.counts = [0] * len(Metrics.BINS)
+        self.setMinimumSize(160, 50)
 
-    def move_bottom(self):
-        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+    def set_counts(self, counts: list):
+        if counts != self.counts:
+            self.counts = counts
+            self.update()
 
+    def paintEvent(self, event):
+        qp = QPainter(self)
+        font_height = qp.fontMetrics().height()
+        qp.drawText(QRect(0, 0, self.width(), font_height), Qt.AlignLeft, self.title)
+
+        top, bottom = font_height, self.height() - font_height
+        qp.fillRect(QRect(0, top, self.width(), bottom - top), QColor(245, 245, 245))
+        highest = max(self.counts) or 1
+        bin_width = self.width() / len(self.counts)
+        for i, count in enumerate(self.counts):
+            bar_height = (bottom - top) * count // highest
+            qp.fillRect(
+                QRect(int(i * bin_width), bottom - bar_height, max(int(bin_width) - 1, 1), bar_height),
+                QColor(70, 130, 180),
+            )
+
+        qp.drawText(QRect(0, bottom, self.width(), font_height), Qt.AlignLeft, "1 µs")
+        qp.drawText(QRect(0, bottom, self.width(), font_height), Qt.AlignHCenter, "1 ms")
+        qp.drawText(QRect(0, bottom, self.width(), font_height), Qt.AlignRight, "1 s")
+
+
+class MetricsWidget(QWidget):
+    REFRESH_INTERVAL = 250
+
+    def __init__(self, quicksort_widget):
+        QWidget.__init__(self)
+        self.quicksort_widget = quicksort_widget
 
-class LogWidget(QLabel):
-    def __init__(self, main_window):
-        QLabel.__init__(self)
-        self.setTextInteractionFlags(
-            Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard
+        self.central_layout = QVBoxLayout()
+        self.central_layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(self.central_layout)
+
+        self.form_layout = QFormLayout()
+        self.central_layout.addLayout(self.form_layout)
+        self.labels = {}
+        for name, title in (
+            ("steps", "Steps:"),
+            ("comparisons", "Comparisons:"),
+            ("swaps", "Swaps:"),
+            ("depth", "Depth (max):"),
+            ("steps_per_second", "Steps/s:"),
+            ("frames_per_second", "Frames/s:"),
+        ):
+            self.labels[name] = QLabel("0")
+            self.form_layout.addRow(title, self.labels[name])
+        self.phases_label = QLabel()
+        self.phases_label.setWordWrap(True)
+        self.form_layout.addRow("Phases:", self.phases_label)
+
+        self.step_histogram = HistogramWidget("Time per step")
+        self.central_layout.addWidget(self.step_histogram)
+        self.paint_histogram = HistogramWidget("Time per paint")
+        self.central_layout.addWidget(self.paint_histogram)
+
+        self.export_button = QPushButton("Export CSV...")
+        self.central_layout.addWidget(self.export_button)
+        self.export_button.clicked.connect(self.export_csv)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+
+    def current_state(self):
+        return self.quicksort_widget.state if self.quicksort_widget.timeline else None
+
+    def refresh(self):
+        metrics = self.quicksort_widget.metrics
+        state = self.current_state()
+        summary = metrics.summary(state)
+        for name, value in summary.items():
+            if name != "max_depth":
+                self.labels[name].setText(f"{value:,}")
+        self.labels["depth"].setText(f"{summary['depth']} ({summary['max_depth']})")
+        phases = state.phase_steps() if state else {}
+        total = max(sum(phases.values()), 1)
+        self.phases_label.setText(
+            ", ".join(f"{phase} {count / total:.0%}" for phase, count in phases.items()) or "-"
         )
-        self.main_window = main_window
-
-    def add_text(self, text: str):
-        if self.text():
-            self.setText(self.text() + "\n" + text)
-        else:
-            self.setText(text)
+        self.step_histogram.set_counts(metrics.histogram(metrics.step_times))
+        self.paint_histogram.set_counts(metrics.histogram(metrics.paint_times))
 
-        # It seems that scrolling cant be done instantly, otherwise last line is not seen
-        QTimer.singleShot(1, lambda: self.main_window.scroll_area_log.move_bottom())
+    def export_csv(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export metrics", "metrics.csv", "CSV files (*.csv)")
+        if path:
+            self.quicksort_widget.metrics.write_csv(path, self.current_state())
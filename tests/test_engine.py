@@ -0,0 +1,60 @@
+import unittest
+from array import array
+from random import Random
+
+from src.engine import ALGORITHMS, PARTITION_SCHEMES, build_trace, quicksort, replay, sort_steps
+from src.inputs import generate_input
+from src.trace import Op
+
+
+class EngineTest(unittest.TestCase):
+    def assert_sorts(self, values, **settings):
+        state = replay(values, build_trace(values, **settings))
+        self.assertEqual(state.values, array("i", sorted(values)))
+
+    def test_sorted_and_reversed(self):
+        # First element pivots on these inputs are covered by the stack depth
+        # test, as they are quadratic
+        for values in (list(range(1, 2001)), list(range(2000, 0, -1))):
+            for pivot in ("random", "median3", "ninther"):
+                with self.subTest(pivot=pivot, reversed=values[0] > 1):
+                    self.assert_sorts(values, pivot=pivot, partition="hoare")
+
+    def test_large_inputs(self):
+        values = generate_input("random", 20000, seed=1)
+        self.assert_sorts(values, pivot="median3", partition="hoare")
+        # Replaying millions of steps is slow, so for these only the array
+        # sorted by the engine is checked
+        for distribution in ("sorted", "reversed"):
+            values = list(generate_input(distribution, 50000, seed=1))
+            with self.subTest(distribution=distribution):
+                for _ in sort_steps(values, pivot="median3", partition="hoare"):
+                    pass
+                self.assertEqual(values, list(range(1, 50001)))
+
+    def test_every_partition_scheme_and_algorithm(self):
+        values = list(generate_input("duplicates", 2000, seed=2))
+        for partition in PARTITION_SCHEMES:
+            with self.subTest(partition=partition):
+                self.assert_sorts(values, pivot="random", partition=partition)
+        for algorithm in ALGORITHMS:
+            with self.subTest(algorithm=algorithm):
+                self.assert_sorts(values, pivot="median3", algorithm=algorithm)
+
+    def test_stack_depth_is_logarithmic(self):
+        # Sorted input with the first element as pivot recurses N levels deep,
+        # past the recursion limit, but the explicit stack only ever holds
+        # the pending larger sides
+        n = 1200
+        for values in (list(range(1, n + 1)), list(range(n, 0, -1)), Random(3).sample(range(1, n + 1), n)):
+            stack = []
+            deepest = 0
+            for step in quicksort(values, 0, n - 1, stack=stack):
+                if step[0] == Op.PIVOT:
+                    deepest = max(deepest, len(stack))
+            self.assertEqual(values, sorted(values))
+            self.assertLessEqual(deepest, n.bit_length() + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
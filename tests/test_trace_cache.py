@@ -0,0 +1,70 @@
+import os
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    from PySide6.QtWidgets import QApplication
+except ImportError:
+    QApplication = None
+
+from src.engine import build_trace
+from src.trace_cache import TraceCache, trace_key, trace_size
+
+
+class TraceCacheTest(unittest.TestCase):
+    def test_least_recently_used_trace_is_evicted(self):
+        traces = [build_trace(range(60, 0, -1)) for _ in range(3)]
+        cache = TraceCache(trace_size(traces[0]) + trace_size(traces[1]))
+        cache.put("a", traces[0])
+        cache.put("b", traces[1])
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("c", traces[2])
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertLessEqual(cache.memory_used, cache.memory_limit)
+
+    def test_key_depends_on_input_and_settings(self):
+        settings = {"algorithm": "quicksort", "pivot": "first"}
+        self.assertEqual(trace_key([3, 1, 2], settings), trace_key([3, 1, 2], dict(settings)))
+        self.assertNotEqual(trace_key([3, 1, 2], settings), trace_key([3, 2, 1], settings))
+        self.assertNotEqual(trace_key([3, 1, 2], settings), trace_key([3, 1, 2], {**settings, "pivot": "random"}))
+
+
+@unittest.skipIf(QApplication is None, "PySide6 is not installed")
+class RestartTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from src.main_window import MainWindow
+
+        cls.app = QApplication.instance() or QApplication([])
+        cls.window = MainWindow()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.window.close()
+
+    def test_stop_then_start_reuses_the_trace(self):
+        quicksort_widget = self.window.quicksort_widget
+        quicksort_widget.number_of_elements = 50
+        quicksort_widget.create_elements()
+        quicksort_widget.shuffle()
+        values = list(quicksort_widget.canvas.values)
+
+        quicksort_widget.start_stop()
+        first_trace = quicksort_widget.trace
+        quicksort_widget.advance(30)
+        quicksort_widget.start_stop()
+        self.assertEqual(list(quicksort_widget.canvas.values), values)
+
+        quicksort_widget.start_stop()
+        self.assertIsNot(quicksort_widget.trace, first_trace)
+        self.assertIs(quicksort_widget.trace.ops, first_trace.ops)
+        quicksort_widget.fast_forward()
+        self.assertTrue(quicksort_widget.sorted)
+        self.assertEqual(list(quicksort_widget.canvas.values), sorted(values))
+        quicksort_widget.start_stop()
+
+
+if __name__ == "__main__":
+    unittest.main()